@@ -0,0 +1,35 @@
+from src.encriptado.encriptar import xor_encriptado, xor_encriptado_archivo
+
+def xor_desencriptado(mensaje_encriptado, llave, out=None):
+  """Desencriptar un mensaje encriptado con xor_encriptado (la operación XOR es su propia inversa).
+
+  Args:
+      mensaje_encriptado (bytes | bytearray | memoryview | numpy.array | list | CargaBits): Mensaje encriptado (arreglo de bytes o carga de bits)
+      llave (bytes | bytearray | memoryview | numpy.array | list): Llave usada para encriptar el mensaje (arreglo de bytes)
+      out (bytearray | memoryview | numpy.array, optional): Buffer escribible donde guardar el resultado
+        (puede ser el mismo mensaje para desencriptar en el lugar). Defaults to None.
+
+  Returns:
+      array | CargaBits: Arreglo de bytes de numpy con el mensaje desencriptado (CargaBits si el mensaje es una CargaBits)
+
+  Raises:
+      TypeError: Si out es un arreglo de numpy que no es uint8 o no es contiguo
+  """
+  return xor_encriptado(mensaje_encriptado, llave, out=out)
+
+def xor_desencriptado_archivo(ruta_entrada, ruta_salida, x0, r, n_warmup, bits_por_iteracion=1, tamano_bloque=1024 * 1024):
+  """Desencriptar en bloques un archivo encriptado con xor_encriptado_archivo.
+
+  Args:
+      ruta_entrada (str): Ruta del archivo encriptado
+      ruta_salida (str): Ruta del archivo desencriptado
+      x0 (float): valor inicial del mapa logístico (rango: [0, 1])
+      r (float): parámetro de caos del mapa logístico (rango: [3.57, 4])
+      n_warmup (int): Número de iteraciones para calentar el sistema
+      bits_por_iteracion (int, optional): Bits de llave extraídos de cada iteración (1, 2, 4 u 8). Defaults to 1.
+      tamano_bloque (int, optional): Tamaño en bytes de cada bloque leído. Defaults to 1 MB.
+
+  Returns:
+      int: Número de bytes procesados
+  """
+  return xor_encriptado_archivo(ruta_entrada, ruta_salida, x0, r, n_warmup, bits_por_iteracion, tamano_bloque)
@@ -1,13 +1,86 @@
 import numpy as np
+from src.utils.caos import FlujoCaotico, cuantizar_orbita
+from src.utils.utils import CargaBits
 
-def xor_encriptado(mensaje, llave):
+def como_arreglo_bytes(datos):
+  """Obtener una vista de bytes (uint8) de los datos, sin copiarlos cuando es posible.
+
+  Args:
+      datos (bytes | bytearray | memoryview | numpy.array | list): Objeto con protocolo de buffer, arreglo de numpy o lista de enteros
+
+  Returns:
+      numpy.array: Arreglo de bytes (uint8); comparte memoria con los datos si son un buffer o un arreglo uint8
+  """
+  if isinstance(datos, np.ndarray):
+    return datos.reshape(-1) if datos.dtype == np.uint8 else datos.reshape(-1).astype(np.uint8)
+  if isinstance(datos, (bytes, bytearray, memoryview)):
+    return np.frombuffer(datos, dtype=np.uint8)
+  return np.asarray(datos, dtype=np.uint8)
+
+def _buffer_salida(out):
+  """Obtener la vista de bytes (uint8) del buffer de salida, sin copiarlo
+
+  Raises:
+      TypeError: Si out es un arreglo de numpy que no es uint8 o no es contiguo (escribir en una copia no modificaría el buffer)
+  """
+  if isinstance(out, np.ndarray) and (out.dtype != np.uint8 or not out.flags.c_contiguous):
+    raise TypeError(f"out debe ser un arreglo uint8 contiguo (se recibió dtype={out.dtype}, contiguo={out.flags.c_contiguous})")
+  return como_arreglo_bytes(out)
+
+def xor_encriptado(mensaje, llave, out=None):
   """Encriptar un mensaje utilizando una llave mediante una operación XOR entre cada byte del mensaje y la llave.
+    Si la llave y el mensaje tienen distinta longitud se usa la menor de ambas.
+
+  Args:
+      mensaje (bytes | bytearray | memoryview | numpy.array | list | CargaBits): Mensaje a encriptar (arreglo de bytes o carga de bits)
+      llave (bytes | bytearray | memoryview | numpy.array | list): Llave para encriptar el mensaje (arreglo de bytes)
+      out (bytearray | memoryview | numpy.array, optional): Buffer escribible donde guardar el resultado
+        (puede ser el mismo mensaje para encriptar en el lugar). Defaults to None.
+
+  Returns:
+      array | CargaBits: Arreglo de bytes de numpy con el mensaje encriptado (CargaBits si el mensaje es una CargaBits)
+
+  Raises:
+      TypeError: Si out es un arreglo de numpy que no es uint8 o no es contiguo
+  """
+  if isinstance(mensaje, CargaBits):
+    encriptado = xor_encriptado(mensaje.datos, llave, out=out)
+    return CargaBits(encriptado, min(mensaje.n_bits, len(encriptado) * 8))
+  mensaje = como_arreglo_bytes(mensaje)
+  llave = como_arreglo_bytes(llave)
+  n = min(len(mensaje), len(llave))
+  if out is not None:
+    out = _buffer_salida(out)[:n]
+  return np.bitwise_xor(mensaje[:n], llave[:n], out=out)
+
+def xor_encriptado_archivo(ruta_entrada, ruta_salida, x0, r, n_warmup, bits_por_iteracion=1, tamano_bloque=1024 * 1024):
+  """Encriptar un archivo en bloques con la llave caótica, sin cargarlo completo en memoria.
+    La llave se genera por partes con un FlujoCaotico y es idéntica a generar_llave(x0, r, n_warmup, tamaño del archivo).
 
   Args:
-      mensaje (list): Mensaje a encriptar (arreglo de bytes)
-      llave (list): Llave para encriptar el mensaje (arreglo de bytes)
+      ruta_entrada (str): Ruta del archivo a encriptar
+      ruta_salida (str): Ruta del archivo encriptado
+      x0 (float): valor inicial del mapa logístico (rango: [0, 1])
+      r (float): parámetro de caos del mapa logístico (rango: [3.57, 4])
+      n_warmup (int): Número de iteraciones para calentar el sistema
+      bits_por_iteracion (int, optional): Bits de llave extraídos de cada iteración (1, 2, 4 u 8). Defaults to 1.
+      tamano_bloque (int, optional): Tamaño en bytes de cada bloque leído. Defaults to 1 MB.
 
   Returns:
-      array: Arreglo de bytes de numpy con el mensaje encriptado
+      int: Número de bytes procesados
   """
-  return np.array([m ^ k for m, k in zip(mensaje, llave)], dtype=np.uint8)
\ No newline at end of file
+  flujo = FlujoCaotico(x0, r, n_warmup)
+  bloque = bytearray(tamano_bloque)
+  total = 0
+  with open(ruta_entrada, 'rb') as entrada, open(ruta_salida, 'wb') as salida:
+    while True:
+      n = entrada.readinto(bloque)
+      if not n:
+        break
+      # Llave del bloque: continúa el flujo caótico donde terminó el bloque anterior
+      llave = cuantizar_orbita(flujo.siguiente(n * 8 // bits_por_iteracion), n, bits_por_iteracion)
+      vista = memoryview(bloque)[:n]
+      xor_encriptado(vista, llave, out=vista)
+      salida.write(vista)
+      total += n
+  return total
@@ -1,6 +1,7 @@
-from src.utils.utils import get_least_significant_bits
-from src.utils.caos import mapa_logistico, generar_secuencia_aleatoria
-from src.utils.chaos_mod_enum import ChaosMod
+import numpy as np
+from src.utils.utils import extraer_planos_bits, CargaBits
+from src.esteganografiado.esteganografiar import (calcular_posiciones, calcular_posiciones_absolutas, abrir_wav_memmap, leer_cabecera_wav,
+                                                  calcular_posiciones_canales, segmento_intercalado, decodificar_pcm, TAMANO_BLOQUE_STREAMING)
 
 def extraer_mensaje_segmento_lsb_sequential(segment_array, message_length, num_least_significant_bits=1):
   """Extraer un mensaje de los bits menos significativos de un arreglo de segmentos de audio. 
@@ -10,74 +11,137 @@ def extraer_mensaje_segmento_lsb_sequential(segment_array, message_length, num_l
 
   Args:
     segment_array (numpy.array): Arreglo de segmentos de audio con el mensaje esteganografiado
-    message_length (int): Longitud del mensaje a extraer (número de caracteres)
-    num_least_significant_bits (int, optional): Número de bits menos significativos a extraer de cada segmento de audio. Defaults to 1.
+    message_length (int): Longitud del mensaje a extraer en bits
+    num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Defaults to 1.
 
   Returns:
-    tuple: Tupla con los bits extraídos y el mensaje extraído
+    tuple: Tupla con los bits extraídos (CargaBits) y el mensaje extraído (bytes)
   """
-  # Extraer un mensaje de los bits menos significativos de un arreglo de segmentos de audio
-  least_significant_bits = get_least_significant_bits(segment_array, num_least_significant_bits)
-  # Obtener los bits menos significativos de cada segmento de audio y concatenarlos en una cadena de bits
-  extracted_bits = ''.join(least_significant_bits[:message_length])
-  # Convertir la cadena de bits a una cadena de caracteres (mensaje)
-  extracted_message = ''.join([chr(int(extracted_bits[i:i+8], 2)) for i in range(0, len(extracted_bits), 8)])
+  posiciones = calcular_posiciones(len(segment_array), message_length, num_least_significant_bits, True)
+  # Obtener los planos de bits menos significativos de las muestras que contienen el mensaje y empaquetarlos
+  planos = extraer_planos_bits(segment_array[posiciones], num_least_significant_bits)
+  extracted_bits = CargaBits.desde_bits(planos.ravel()[:message_length])
+  # Los bytes del mensaje son los bits empaquetados (cada 8 bits forman un byte)
+  extracted_message = extracted_bits.a_bytes()
   # Retornar los bits extraídos y el mensaje extraído
   #print("Bits extraídos", extracted_bits)
   #print("Mensaje extraído", extracted_message)
   return extracted_bits, extracted_message
 
-def extraer_mensaje_segmento_lsb_random(modified_segment_array, message_length, num_least_significant_bits=1):
+def extraer_mensaje_segmento_lsb_random(modified_segment_array, message_length, num_least_significant_bits=1, parametros_caos=None):
   """Extraer un mensaje oculto en los bits menos significativos de un arreglo de segmentos de audio,
   utilizando la misma secuencia aleatoria que se usó para insertar el mensaje.
   
   Args:
     modified_segment_array (numpy.array): Arreglo de segmentos de audio modificado con el mensaje oculto
     message_length (int): Longitud del mensaje a extraer en bits
-    num_least_significant_bits (int, optional): Número de bits menos significativos usados para ocultar el mensaje. Por defecto es 1.
+    num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Por defecto es 1.
+    parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Por defecto None (valores de ChaosMod).
   
   Returns:
-    tuple: Tupla que contiene la cadena de bits extraídos y el mensaje original en texto
+    tuple: Tupla que contiene los bits extraídos (CargaBits) y el mensaje extraído (bytes)
   """
-  # Obtener los bits menos significativos de cada segmento de audio modificado
-  least_significant_bits = get_least_significant_bits(modified_segment_array, num_least_significant_bits)
-  
-  #print(f"Tamaño arreglo bits menos significativos (Capacidad en bits): {len(least_significant_bits)}")
-  # Generar la misma secuencia aleatoria utilizada para insertar el mensaje
-  secuencia_aleatoria = generar_secuencia_aleatoria(
-    ChaosMod.X0.value,
-    ChaosMod.R.value,
-    ChaosMod.N_WARMUP.value,
-    0,
-    message_length,
-    'int'
-  )
+  # Generar la misma secuencia aleatoria utilizada para insertar el mensaje (posiciones sobre todo el segmento)
+  posiciones = calcular_posiciones(len(modified_segment_array), message_length, num_least_significant_bits, False, parametros_caos)
   
-  #print("Secuencia aleatoria", secuencia_aleatoria)
-  
-  # Extraer los bits del mensaje de los segmentos de audio en las posiciones aleatorias
-  extracted_bits_list = []
-  for i, bit_index in enumerate(secuencia_aleatoria):
-    # Asegurarse de que el índice no exceda el tamaño del arreglo
-    if bit_index < len(least_significant_bits):
-      # Obtener el bit menos significativo en la posición aleatoria
-      lsb = least_significant_bits[i]
-      # Agregar el bit extraído a la lista
-      extracted_bits_list.append(lsb)
-      # Imprimir el índice del bit, el LSB y la cadena de bits extraídos hasta el momento
-      #print(f"Bit index: {bit_index} - LSB: {lsb} - Sample bin: {''.join(extracted_bits_list)}")
-    else:
-      #print(f"Índice fuera de rango: {bit_index}")
-      break
-  #0011110001001101101011000010110100101101011110001101000111011100
-  #1001010010000101011100000011110010011111110110101011010011001110
-  # Unir los bits extraídos en una cadena
-  extracted_bits = ''.join(extracted_bits_list)
+  # Leer de una sola vez (gather) las muestras de las posiciones aleatorias y obtener sus bits menos significativos
+  planos = extraer_planos_bits(modified_segment_array[posiciones], num_least_significant_bits)
+  # Empaquetar los bits extraídos
+  extracted_bits = CargaBits.desde_bits(planos.ravel()[:message_length])
   #print("Bits extraídos", extracted_bits)
   
-  # Convertir los bits extraídos a caracteres (cada 8 bits forman un carácter)
-  extracted_message = ''.join([chr(int(extracted_bits[i:i+8], 2)) for i in range(0, len(extracted_bits), 8)])
+  # Los bytes del mensaje son los bits empaquetados (cada 8 bits forman un byte)
+  extracted_message = extracted_bits.a_bytes()
   #print("Mensaje extraído", extracted_message)
   
   # Retornar los bits extraídos y el mensaje extraído
-  return extracted_bits, extracted_message
\ No newline at end of file
+  return extracted_bits, extracted_message
+
+
+def extraer_mensaje_multicanal(audio_array, message_length, inicio_frame, fin_frame, n_canales=None, canales=None, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Extraer un mensaje repartido entre los canales de un audio (ver insertar_mensaje_multicanal).
+    Solo se leen las muestras de las posiciones del mensaje, sobre una vista del audio (sirve también con np.memmap).
+
+  Args:
+    audio_array (numpy.array): Audio intercalado (1-D) o con forma (frames, canales) con el mensaje esteganografiado
+    message_length (int): Longitud del mensaje a extraer en bits
+    inicio_frame (int): Primer frame del segmento donde se oculta el mensaje
+    fin_frame (int): Fin (exclusivo) del segmento, en frames
+    n_canales (int, optional): Número de canales del audio intercalado. Defaults to None (audio_array.shape[1] o 1).
+    canales (list, optional): Canales que transportan el mensaje. Defaults to None (todos).
+    sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+    num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Defaults to 1.
+    parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+    tuple: Tupla con los bits extraídos (CargaBits) y el mensaje extraído (bytes)
+  """
+  segmento, n_canales = segmento_intercalado(audio_array, inicio_frame, fin_frame, n_canales)
+  posiciones = calcular_posiciones_canales(fin_frame - inicio_frame, n_canales, message_length, canales,
+                                           num_least_significant_bits, sequential, parametros_caos)
+  planos = extraer_planos_bits(segmento[posiciones], num_least_significant_bits)
+  extracted_bits = CargaBits.desde_bits(planos.ravel()[:message_length])
+  return extracted_bits, extracted_bits.a_bytes()
+
+
+def extraer_mensaje_wav_streaming(ruta_archivo, message_length, inicio_segmento, fin_segmento, sequential=True, num_least_significant_bits=1, tamano_bloque=TAMANO_BLOQUE_STREAMING, parametros_caos=None):
+  """Extraer un mensaje de un archivo WAV leyendo por bloques solo las partes que contienen posiciones del mensaje,
+    con memoria constante respecto al tamaño del archivo.
+
+  Args:
+    ruta_archivo (str): Ruta del archivo WAV esteganografiado
+    message_length (int): Longitud del mensaje a extraer en bits
+    inicio_segmento (int): Inicio (en muestras) del segmento donde se oculta el mensaje
+    fin_segmento (int): Fin (en muestras) del segmento donde se oculta el mensaje
+    sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+    num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Defaults to 1.
+    tamano_bloque (int, optional): Tamaño aproximado en bytes de cada bloque leído. Defaults to 4 MB.
+    parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+    tuple: Tupla con los bits extraídos (CargaBits) y el mensaje extraído (bytes)
+  """
+  posiciones = calcular_posiciones_absolutas(inicio_segmento, fin_segmento, message_length, num_least_significant_bits, sequential, parametros_caos)
+  orden = np.argsort(posiciones, kind='stable')
+  posiciones_ordenadas = posiciones[orden]
+  planos = np.empty((len(posiciones), num_least_significant_bits), dtype=np.uint8)
+  cabecera = leer_cabecera_wav(ruta_archivo)
+  ancho = cabecera.ancho_muestra
+  muestras_por_bloque = max(1, tamano_bloque // (ancho * cabecera.n_canales)) * cabecera.n_canales
+  with open(ruta_archivo, 'rb') as wav_file:
+    a = 0
+    while a < len(posiciones_ordenadas):
+      # Saltar directamente a la siguiente posición pendiente (no se leen los bloques intermedios)
+      inicio_bloque = int(posiciones_ordenadas[a])
+      wav_file.seek(cabecera.offset_datos + inicio_bloque * ancho)
+      n_bytes = min(muestras_por_bloque * ancho, cabecera.n_bytes_datos - inicio_bloque * ancho)
+      bloque = decodificar_pcm(wav_file.read(n_bytes - n_bytes % ancho), cabecera)
+      b = np.searchsorted(posiciones_ordenadas, inicio_bloque + len(bloque))
+      planos[orden[a:b]] = extraer_planos_bits(bloque[posiciones_ordenadas[a:b] - inicio_bloque], num_least_significant_bits)
+      a = b
+  extracted_bits = CargaBits.desde_bits(planos.ravel()[:message_length])
+  # Los bytes del mensaje son los bits empaquetados (cada 8 bits forman un byte)
+  return extracted_bits, extracted_bits.a_bytes()
+
+def extraer_mensaje_wav_memmap(ruta_archivo, message_length, inicio_segmento, fin_segmento, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Extraer un mensaje de un archivo WAV mapeado en memoria (np.memmap).
+    Solo se leen las páginas del archivo que contienen las posiciones del mensaje.
+
+  Args:
+    ruta_archivo (str): Ruta del archivo WAV esteganografiado
+    message_length (int): Longitud del mensaje a extraer en bits
+    inicio_segmento (int): Inicio (en muestras) del segmento donde se oculta el mensaje
+    fin_segmento (int): Fin (en muestras) del segmento donde se oculta el mensaje
+    sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+    num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Defaults to 1.
+    parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+    tuple: Tupla con los bits extraídos (CargaBits) y el mensaje extraído (bytes)
+  """
+  muestras, _ = abrir_wav_memmap(ruta_archivo, 'r')
+  # La rebanada del segmento es una vista: las funciones de extracción solo leen las posiciones del mensaje
+  segmento = muestras[inicio_segmento:fin_segmento]
+  if sequential:
+    return extraer_mensaje_segmento_lsb_sequential(segmento, message_length, num_least_significant_bits)
+  return extraer_mensaje_segmento_lsb_random(segmento, message_length, num_least_significant_bits, parametros_caos)
@@ -1,26 +1,260 @@
 import wave
+import struct
+import shutil
 import numpy as np
-from src.utils.utils import get_least_significant_bits
+from collections import namedtuple
+from src.utils.utils import bits_to_array
 from src.utils.caos import mapa_logistico, generar_secuencia_aleatoria
 from src.utils.chaos_mod_enum import ChaosMod
+from src.utils.metricas import mse_psnr
+
+# Tamaño de bloque (bytes) para el procesamiento por bloques de archivos WAV
+TAMANO_BLOQUE_STREAMING = 4 * 1024 * 1024
+
+# Parámetros del bloque de datos de un archivo WAV obtenidos de su cabecera RIFF
+CabeceraWav = namedtuple('CabeceraWav', ['formato', 'n_canales', 'frecuencia', 'ancho_muestra', 'offset_datos', 'n_bytes_datos'])
+
+# Códigos de formato del bloque 'fmt ' (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE)
+FORMATO_PCM = 1
+FORMATO_FLOAT = 3
+FORMATO_EXTENSIBLE = 0xFFFE
+
+# Parámetros de un archivo WAV con los mismos campos que wave.getparams() (comptype 'FLOAT' para flotante IEEE)
+ParametrosWav = namedtuple('ParametrosWav', ['nchannels', 'sampwidth', 'framerate', 'nframes', 'comptype', 'compname'])
+
+def leer_cabecera_wav(filename):
+  """Leer la cabecera RIFF de un archivo WAV y ubicar el bloque 'data' sin leer las muestras.
+
+  Args:
+      filename (str): Ruta del archivo WAV
+
+  Returns:
+      CabeceraWav: Formato, número de canales, frecuencia de muestreo, ancho de muestra (bytes),
+        posición (offset) del primer byte de audio y tamaño en bytes del bloque 'data'
+
+  Raises:
+      ValueError: Si el archivo no es un WAV válido o no tiene bloques 'fmt ' y 'data'
+  """
+  with open(filename, 'rb') as archivo:
+    riff, _, wave_id = struct.unpack('<4sI4s', archivo.read(12))
+    if riff != b'RIFF' or wave_id != b'WAVE':
+      raise ValueError("El archivo no es un WAV (RIFF/WAVE) válido")
+    formato = None
+    while True:
+      encabezado = archivo.read(8)
+      if len(encabezado) < 8:
+        raise ValueError("El archivo WAV no tiene bloque 'data'")
+      id_bloque, tamano = struct.unpack('<4sI', encabezado)
+      if id_bloque == b'fmt ':
+        datos_fmt = archivo.read(tamano)
+        formato, n_canales, frecuencia, _, _, bits_por_muestra = struct.unpack('<HHIIHH', datos_fmt[:16])
+        if formato == FORMATO_EXTENSIBLE and tamano >= 26:
+          # En WAVE_FORMAT_EXTENSIBLE el formato real son los primeros 2 bytes del subformato (GUID)
+          formato = struct.unpack('<H', datos_fmt[24:26])[0]
+      elif id_bloque == b'data':
+        if formato is None:
+          raise ValueError("El archivo WAV no tiene bloque 'fmt ' antes de 'data'")
+        return CabeceraWav(formato, n_canales, frecuencia, bits_por_muestra // 8, archivo.tell(), tamano)
+      else:
+        archivo.seek(tamano, 1)
+      # Los bloques de tamaño impar llevan un byte de relleno
+      if tamano % 2:
+        archivo.seek(1, 1)
+
+def tipo_muestras_wav(cabecera):
+  """Obtener el tipo de numpy de las muestras de un WAV a partir de su cabecera
+
+  Args:
+      cabecera (CabeceraWav): Cabecera del archivo WAV
+
+  Returns:
+      numpy.dtype: Tipo de las muestras (uint8, int16, int32 o float32, little-endian)
+
+  Raises:
+      ValueError: Si el formato no tiene un tipo nativo de numpy (por ejemplo PCM de 24 bits)
+  """
+  if cabecera.formato == FORMATO_FLOAT and cabecera.ancho_muestra == 4:
+    return np.dtype('<f4')
+  tipos = {1: np.dtype('u1'), 2: np.dtype('<i2'), 4: np.dtype('<i4')}
+  if cabecera.formato != FORMATO_PCM or cabecera.ancho_muestra not in tipos:
+    raise ValueError(f"Formato WAV no soportado (formato={cabecera.formato}, {cabecera.ancho_muestra * 8} bits)")
+  return tipos[cabecera.ancho_muestra]
+
+def decodificar_pcm(datos, cabecera):
+  """Decodificar los bytes del bloque 'data' de un WAV en un arreglo de muestras intercaladas, sin recorrer muestra por muestra.
+    PCM de 8, 16 y 32 bits y flotante IEEE de 32 bits se interpretan directamente sobre el búfer (sin copia).
+    PCM de 24 bits se lee con una vista de pasos (stride tricks) de 4 bytes cada 3 bytes y se extiende el signo a int32.
+    En todos los casos los bits menos significativos de cada muestra son los del archivo, por lo que la
+    inserción LSB opera de forma nativa en cada profundidad.
+
+  Args:
+      datos (bytes | bytearray): Bytes de audio (un número entero de muestras)
+      cabecera (CabeceraWav): Cabecera del archivo WAV
+
+  Returns:
+      numpy.array: Arreglo de muestras (uint8, int16, int32 o float32); es escribible si datos es un bytearray
+
+  Raises:
+      ValueError: Si el formato de las muestras no es soportado
+  """
+  if cabecera.formato != FORMATO_PCM or cabecera.ancho_muestra != 3:
+    return np.frombuffer(datos, dtype=tipo_muestras_wav(cabecera))
+  n_muestras = len(datos) // 3
+  # Un byte de relleno al final para que la ventana de 4 bytes de la última muestra no salga del búfer
+  relleno = np.zeros(3 * n_muestras + 1, dtype=np.uint8)
+  relleno[:3 * n_muestras] = np.frombuffer(datos, dtype=np.uint8, count=3 * n_muestras)
+  ventanas = np.ndarray(shape=(n_muestras,), dtype='<i4', buffer=relleno, strides=(3,))
+  # Descartar el byte sobrante (el más alto) y extender el signo del bit 23
+  return (ventanas << 8) >> 8
+
+def codificar_pcm(arreglo, ancho_muestra):
+  """Codificar un arreglo de muestras en los bytes del bloque 'data' de un WAV (inverso de decodificar_pcm)
+
+  Args:
+      arreglo (numpy.array): Arreglo de muestras (uint8, int16, int32 o float32)
+      ancho_muestra (int): Ancho de cada muestra en bytes (1, 2, 3 o 4)
+
+  Returns:
+      bytes: Bytes de audio little-endian
+  """
+  if ancho_muestra != 3:
+    return np.ascontiguousarray(arreglo, dtype=arreglo.dtype.newbyteorder('<')).tobytes()
+  # Tomar los 3 bytes bajos de cada muestra de 32 bits (vista de pasos sobre los bytes little-endian)
+  bytes_muestras = np.ascontiguousarray(arreglo, dtype='<i4').view(np.uint8).reshape(-1, 4)
+  return bytes_muestras[:, :3].tobytes()
+
+def obtener_parametros_wav(filename):
+  """Obtener los parámetros de un archivo WAV con los mismos campos que wave.getparams(), para cualquier formato soportado.
+    El módulo wave no abre WAV flotantes, por lo que se leen de la cabecera RIFF; comptype es 'FLOAT' para estos.
+
+  Args:
+      filename (str): Ruta del archivo WAV
+
+  Returns:
+      ParametrosWav: (nchannels, sampwidth, framerate, nframes, comptype, compname)
+  """
+  cabecera = leer_cabecera_wav(filename)
+  n_frames = cabecera.n_bytes_datos // (cabecera.ancho_muestra * cabecera.n_canales)
+  if cabecera.formato == FORMATO_FLOAT:
+    return ParametrosWav(cabecera.n_canales, cabecera.ancho_muestra, cabecera.frecuencia, n_frames, 'FLOAT', 'IEEE float')
+  return ParametrosWav(cabecera.n_canales, cabecera.ancho_muestra, cabecera.frecuencia, n_frames, 'NONE', 'not compressed')
+
+def escribir_cabecera_wav(archivo, formato, n_canales, frecuencia, ancho_muestra, n_bytes_datos):
+  """Escribir la cabecera RIFF (bloques 'fmt ', 'fact' para flotante y encabezado de 'data') de un archivo WAV
+
+  Args:
+      archivo (file): Archivo abierto en modo binario de escritura
+      formato (int): Código de formato (FORMATO_PCM o FORMATO_FLOAT)
+      n_canales (int): Número de canales
+      frecuencia (int): Frecuencia de muestreo
+      ancho_muestra (int): Ancho de cada muestra en bytes
+      n_bytes_datos (int): Tamaño en bytes del bloque 'data'
+  """
+  alineacion = n_canales * ancho_muestra
+  # Los formatos distintos de PCM llevan un bloque 'fact' con el número de frames
+  fact = struct.pack('<4sII', b'fact', 4, n_bytes_datos // alineacion) if formato != FORMATO_PCM else b''
+  fmt = struct.pack('<4sIHHIIHH', b'fmt ', 16, formato, n_canales, frecuencia, frecuencia * alineacion, alineacion, ancho_muestra * 8)
+  tamano_riff = 4 + len(fmt) + len(fact) + 8 + n_bytes_datos + (n_bytes_datos % 2)
+  archivo.write(struct.pack('<4sI4s', b'RIFF', tamano_riff, b'WAVE') + fmt + fact + struct.pack('<4sI', b'data', n_bytes_datos))
+
+def abrir_wav_memmap(filename, modo='r'):
+  """Exponer las muestras de un archivo WAV como un np.memmap, sin decodificar el archivo en memoria.
+    Solo se leen (o escriben) las páginas del archivo que se acceden.
+
+  Args:
+      filename (str): Ruta del archivo WAV
+      modo (str, optional): Modo de np.memmap: 'r' (solo lectura), 'r+' (escritura sobre el archivo)
+        o 'c' (copia en escritura: los cambios quedan en memoria y no se guardan). Defaults to 'r'.
+
+  Returns:
+      tuple: (np.memmap con las muestras intercaladas, CabeceraWav)
+  """
+  cabecera = leer_cabecera_wav(filename)
+  tipo = tipo_muestras_wav(cabecera)
+  muestras = np.memmap(filename, dtype=tipo, mode=modo, offset=cabecera.offset_datos,
+                       shape=(cabecera.n_bytes_datos // tipo.itemsize,))
+  return muestras, cabecera
+
+def insertar_mensaje_wav_memmap(ruta_entrada, ruta_salida, message_bits, inicio_segmento, fin_segmento, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Insertar un mensaje escribiendo directamente en una copia mapeada en memoria (np.memmap) del archivo WAV.
+    Solo se leen y escriben las páginas de las muestras que contienen el mensaje.
+
+  Args:
+      ruta_entrada (str): Ruta del archivo WAV original
+      ruta_salida (str): Ruta del archivo WAV esteganografiado (copia del original)
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      inicio_segmento (int): Inicio (en muestras) del segmento donde se oculta el mensaje
+      fin_segmento (int): Fin (en muestras) del segmento donde se oculta el mensaje
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Raises:
+      ValueError: Si el mensaje es muy largo para ser insertado en el segmento
+  """
+  posiciones = calcular_posiciones_absolutas(inicio_segmento, fin_segmento, len(message_bits), num_least_significant_bits, sequential, parametros_caos)
+  # La copia la hace el sistema operativo (copy_file_range/sendfile) sin pasar las muestras por Python
+  shutil.copyfile(ruta_entrada, ruta_salida)
+  muestras, _ = abrir_wav_memmap(ruta_salida, 'r+')
+  escribir_bits_lsb(muestras, posiciones, message_bits, num_least_significant_bits)
+  muestras.flush()
+  del muestras
+
+def actualizar_mensaje_wav(ruta_archivo, message_bits, inicio_segmento, fin_segmento, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Actualizar en el lugar el mensaje oculto de un archivo WAV esteganografiado.
+    Se leen solo las muestras de las posiciones del mensaje y se reescriben (mediante np.memmap) únicamente
+    las que cambian, por lo que la E/S es proporcional al mensaje y no al tamaño del archivo.
+    En modo aleatorio las posiciones son un prefijo de la permutación caótica de todo el segmento: la primera
+    llamada con un segmento y parámetros caóticos dados genera y ordena la órbita completa (tiempo
+    O(n log n) y memoria O(n), con n las muestras del segmento) y la deja en la caché de caos.py
+    (hasta LIMITE_CACHE_PERMUTACIONES bytes); las actualizaciones siguientes la reutilizan y solo
+    copian el prefijo, con un costo proporcional al mensaje.
+    Si el mensaje nuevo es más corto que el anterior, los bits sobrantes del anterior permanecen en el audio.
+
+  Args:
+      ruta_archivo (str): Ruta del archivo WAV esteganografiado (se modifica en el lugar)
+      message_bits (CargaBits | str): Carga de bits con el mensaje nuevo
+      inicio_segmento (int): Inicio (en muestras) del segmento donde se oculta el mensaje
+      fin_segmento (int): Fin (en muestras) del segmento donde se oculta el mensaje
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      int: Número de muestras reescritas
+
+  Raises:
+      ValueError: Si el mensaje es muy largo para ser insertado en el segmento
+  """
+  muestras, _ = abrir_wav_memmap(ruta_archivo, 'r+')
+  posiciones = calcular_posiciones_absolutas(inicio_segmento, fin_segmento, len(message_bits), num_least_significant_bits, sequential, parametros_caos)
+  # Calcular los valores nuevos sobre una copia de las muestras afectadas
+  actuales = muestras[posiciones]
+  nuevas = np.copy(actuales)
+  escribir_bits_lsb(nuevas, slice(None), message_bits, num_least_significant_bits)
+  # Escribir solo las muestras cuyo valor cambia
+  cambios = nuevas != actuales
+  muestras[posiciones[cambios]] = nuevas[cambios]
+  muestras.flush()
+  del muestras
+  return int(np.count_nonzero(cambios))
 
 def cargar_archivo_wav(filename):
   """Cargar un archivo de audio en formato WAV y retornar un arreglo de numpy con los datos de audio.
+    Soporta PCM de 8, 16, 24 y 32 bits y flotante IEEE de 32 bits (ver decodificar_pcm).
 
   Args:
       filename (str): Ruta del archivo de audio en formato WAV a cargar
 
   Returns:
-      numpy.array: Arreglo de numpy con los datos de audio del archivo WAV
+      numpy.array: Arreglo de numpy con las muestras intercaladas del archivo WAV
   """
-  with wave.open(filename, 'rb') as wav_file:
-    # Obtener los parámetros del archivo de audio WAV
-    n_frames = wav_file.getnframes()
-    # Leer los datos de audio del archivo WAV
-    audio_data = wav_file.readframes(n_frames)
-    # Convertir los datos de audio a un arreglo de numpy con valores enteros de 16 bits
-    audio_array = np.frombuffer(audio_data, dtype=np.int16)
-  return audio_array
+  cabecera = leer_cabecera_wav(filename)
+  with open(filename, 'rb') as wav_file:
+    # Leer solo el bloque 'data' (un número entero de muestras)
+    wav_file.seek(cabecera.offset_datos)
+    audio_data = wav_file.read(cabecera.n_bytes_datos - cabecera.n_bytes_datos % cabecera.ancho_muestra)
+  return decodificar_pcm(audio_data, cabecera)
 
 def guardar_archivo_wav(filename, audio_array, params):
   """Guardar un arreglo de numpy con los datos de audio en un archivo WAV.
@@ -28,21 +262,178 @@ def guardar_archivo_wav(filename, audio_array, params):
   Args:
       filename (str): Ruta del archivo WAV a guardar los datos de audio
       audio_array (numpy.array): Arreglo de numpy con los datos de audio a guardar
-      params (any): Parámetros del archivo WAV (número de canales, frecuencia de muestreo, profundidad de bits, etc.)
+      params (any): Parámetros del archivo WAV (número de canales, frecuencia de muestreo, profundidad de bits, etc.),
+        como los de wave.getparams() u obtener_parametros_wav()
   """
+  datos = codificar_pcm(audio_array, params.sampwidth)
+  if params.comptype == 'FLOAT':
+    # El módulo wave solo escribe PCM: la cabecera del WAV flotante se escribe directamente
+    with open(filename, 'wb') as wav_file:
+      escribir_cabecera_wav(wav_file, FORMATO_FLOAT, params.nchannels, params.framerate, params.sampwidth, len(datos))
+      wav_file.write(datos)
+      if len(datos) % 2:
+        wav_file.write(b'\x00')
+    return
   with wave.open(filename, 'wb') as wav_file:
     # Establecer los parámetros del archivo WAV (número de canales, frecuencia de muestreo, profundidad de bits, etc.)
     wav_file.setparams(params)
-    # Escribir los datos de audio en el archivo WAV (convertir el arreglo de numpy a bytes)
-    wav_file.writeframes(audio_array.tobytes())
+    # Escribir los datos de audio en el archivo WAV
+    wav_file.writeframes(datos)
+
+def calcular_posiciones(n_muestras, n_bits, num_least_significant_bits=1, sequential=True, parametros_caos=None):
+  """Calcular las posiciones (muestras) del segmento que contienen el mensaje, en el orden de los bits.
+    Cada muestra guarda num_least_significant_bits bits, por lo que se usan ceil(n_bits / num_least_significant_bits) muestras.
+
+  Args:
+      n_muestras (int): Número de muestras del segmento
+      n_bits (int): Longitud del mensaje en bits
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+      sequential (bool, optional): Posiciones consecutivas desde el inicio (True) o elegidas por la secuencia caótica (False). Defaults to True.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      slice | numpy.array: Rebanada (secuencial) o arreglo de índices (aleatorio) de las muestras usadas
+
+  Raises:
+      ValueError: Si el mensaje es muy largo para ser insertado en el audio o la profundidad no está entre 1 y 4
+  """
+  if not 1 <= num_least_significant_bits <= 4:
+    raise ValueError("El número de bits menos significativos debe estar entre 1 y 4")
+  muestras_necesarias = -(-n_bits // num_least_significant_bits)
+  if n_muestras < muestras_necesarias:
+    raise ValueError("El mensaje es muy largo para ser insertado en el audio")
+  if sequential:
+    return slice(0, muestras_necesarias)
+  if parametros_caos is None:
+    parametros_caos = (ChaosMod.X0.value, ChaosMod.R.value, ChaosMod.N_WARMUP.value)
+  x0, r, n_warmup = parametros_caos
+  # Posiciones aleatorias sobre todo el segmento (sin repeticiones): prefijo de la permutación caótica,
+  # que se ordena una sola vez por segmento y se reutiliza desde la caché de caos.py
+  secuencia_aleatoria = generar_secuencia_aleatoria(
+                              x0,
+                              r,
+                              n_warmup,
+                              0,
+                              n_muestras,
+                              'int',
+                              muestras_necesarias)
+  return np.asarray(secuencia_aleatoria, dtype=np.intp)
+
+def calcular_posiciones_absolutas(inicio_segmento, fin_segmento, n_bits, num_least_significant_bits=1, sequential=True, parametros_caos=None):
+  """Calcular las posiciones absolutas (índices de muestra en todo el audio) que contienen el mensaje, en el orden de los bits.
+
+  Args:
+      inicio_segmento (int): Inicio del segmento donde se oculta el mensaje
+      fin_segmento (int): Fin del segmento donde se oculta el mensaje
+      n_bits (int): Longitud del mensaje en bits
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+      sequential (bool, optional): Posiciones consecutivas (True) o caóticas (False). Defaults to True.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      numpy.array: Arreglo de índices (intp) de las muestras usadas
+  """
+  posiciones = calcular_posiciones(fin_segmento - inicio_segmento, n_bits, num_least_significant_bits, sequential, parametros_caos)
+  if isinstance(posiciones, slice):
+    posiciones = np.arange(posiciones.start, posiciones.stop, dtype=np.intp)
+  return inicio_segmento + posiciones
+
+def agrupar_bits(message_bits, num_least_significant_bits=1):
+  """Agrupar los bits del mensaje de k en k (una fila por muestra), rellenando con ceros el último grupo
+
+  Args:
+      message_bits (CargaBits | str | array): Bits del mensaje
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (k). Defaults to 1.
+
+  Returns:
+      numpy.array: Matriz (ceil(n_bits / k), k) de bits (uint8)
+  """
+  bits = bits_to_array(message_bits)
+  k = num_least_significant_bits
+  n_muestras = -(-len(bits) // k)
+  grupos = np.zeros(n_muestras * k, dtype=np.uint8)
+  grupos[:len(bits)] = bits
+  return grupos.reshape(n_muestras, k)
+
+def escribir_bits_lsb(arreglo, posiciones, message_bits, num_least_significant_bits=1):
+  """Escribir (en el lugar) los bits del mensaje en los bits menos significativos de las muestras indicadas.
+    Cada muestra recibe num_least_significant_bits bits del mensaje (el primero en el bit más alto de los k),
+    empaquetados en un valor y escritos con una sola operación de máscara sobre todas las posiciones.
+    Se opera sobre la vista sin signo de las muestras (complemento a dos), válido para muestras negativas.
+
+  Args:
+      arreglo (numpy.array): Arreglo de muestras a modificar (puede ser un np.memmap)
+      posiciones (slice | numpy.array): Muestras donde escribir, en el orden de los bits (ver calcular_posiciones)
+      message_bits (CargaBits | str | array): Bits del mensaje
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+  """
+  k = num_least_significant_bits
+  sin_signo = arreglo.view(np.dtype(f'u{arreglo.dtype.itemsize}'))
+  # Convertir cada grupo de k bits en un valor
+  grupos = agrupar_bits(message_bits, k)
+  pesos = (1 << np.arange(k - 1, -1, -1)).astype(sin_signo.dtype)
+  valores = (grupos * pesos).sum(axis=1, dtype=sin_signo.dtype)
+  # Limpiar los k bits bajos y establecer los bits del mensaje
+  mascara = sin_signo.dtype.type(np.iinfo(sin_signo.dtype).max ^ ((1 << k) - 1))
+  sin_signo[posiciones] = (sin_signo[posiciones] & mascara) | valores
+
+def insertar_mensaje_wav_streaming(ruta_entrada, ruta_salida, message_bits, inicio_segmento, fin_segmento, sequential=True, num_least_significant_bits=1, tamano_bloque=TAMANO_BLOQUE_STREAMING, parametros_caos=None):
+  """Insertar un mensaje en un archivo WAV por bloques de tamaño fijo, con memoria constante.
+    Los bloques que no contienen posiciones del mensaje se copian tal cual; solo se modifican los que se solapan con él.
+    El resultado es idéntico a cargar el audio, insertar el mensaje en el segmento y guardarlo.
+
+  Args:
+      ruta_entrada (str): Ruta del archivo WAV original
+      ruta_salida (str): Ruta del archivo WAV esteganografiado
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      inicio_segmento (int): Inicio (en muestras) del segmento donde se oculta el mensaje
+      fin_segmento (int): Fin (en muestras) del segmento donde se oculta el mensaje
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (1 a 4). Defaults to 1.
+      tamano_bloque (int, optional): Tamaño aproximado en bytes de cada bloque leído. Defaults to 4 MB.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Raises:
+      ValueError: Si el mensaje es muy largo para ser insertado en el segmento
+  """
+  posiciones = calcular_posiciones_absolutas(inicio_segmento, fin_segmento, len(message_bits), num_least_significant_bits, sequential, parametros_caos)
+  grupos = agrupar_bits(message_bits, num_least_significant_bits)
+  # Ordenar las posiciones para recorrerlas junto con los bloques del archivo
+  orden = np.argsort(posiciones, kind='stable')
+  posiciones, grupos = posiciones[orden], grupos[orden]
+  cabecera = leer_cabecera_wav(ruta_entrada)
+  ancho = cabecera.ancho_muestra
+  muestras_por_bloque = max(1, tamano_bloque // (ancho * cabecera.n_canales)) * cabecera.n_canales
+  with open(ruta_entrada, 'rb') as entrada, open(ruta_salida, 'wb') as salida:
+    # La cabecera se copia tal cual: solo cambian los bits menos significativos de las muestras
+    salida.write(entrada.read(cabecera.offset_datos))
+    bytes_restantes = cabecera.n_bytes_datos - cabecera.n_bytes_datos % ancho
+    inicio_bloque = 0
+    while bytes_restantes > 0:
+      datos = entrada.read(min(muestras_por_bloque * ancho, bytes_restantes))
+      if not datos:
+        break
+      bytes_restantes -= len(datos)
+      # Posiciones del mensaje dentro de este bloque (en muestras)
+      fin_bloque = inicio_bloque + len(datos) // ancho
+      a, b = np.searchsorted(posiciones, [inicio_bloque, fin_bloque])
+      if a < b:
+        bloque = decodificar_pcm(bytearray(datos), cabecera)
+        escribir_bits_lsb(bloque, posiciones[a:b] - inicio_bloque, grupos[a:b].ravel(), num_least_significant_bits)
+        datos = codificar_pcm(bloque, ancho)
+      salida.write(datos)
+      inicio_bloque = fin_bloque
+    # Copiar lo que sigue a las muestras (byte de relleno y bloques posteriores a 'data')
+    shutil.copyfileobj(entrada, salida)
 
 def insertar_mensaje_segmento_lsb_sequential(segment_array, message_bits, num_least_significant_bits=1):
   """Insertar un mensaje en los bits menos significativos de un arreglo de segmentos de audio.
 
   Args:
       segment_array (numpy.array): Arreglo de segmentos de audio en formato de 16 bits (int16)
-      message_bits (str): Cadena de bits con el mensaje a insertar en los segmentos de audio
-      num_least_significant_bits (int, optional): Número de bits menos significativos a utilizar para insertar el mensaje. Defaults to 1.
+      message_bits (CargaBits | str): Carga de bits empaquetada (o cadena de bits) con el mensaje a insertar en los segmentos de audio
+      num_least_significant_bits (int, optional): Número de bits menos significativos a utilizar para insertar el mensaje (1 a 4),
+        cada muestra guarda ese número de bits del mensaje. Defaults to 1.
 
   Returns:
       numpy.array: Arreglo de segmentos de audio con el mensaje esteganografiado
@@ -50,36 +441,24 @@ def insertar_mensaje_segmento_lsb_sequential(segment_array, message_bits, num_le
   Raises:
       ValueError: Si el mensaje es muy largo para ser insertado en el audio
   """
+  # Capacidad en bits: num_least_significant_bits bits del mensaje por cada muestra del segmento
+  posiciones = calcular_posiciones(len(segment_array), len(message_bits), num_least_significant_bits, True)
   modified_segment_array = np.copy(segment_array)
-  # Obtener los bits menos significativos de cada segmento de audio
-  least_significant_bits = get_least_significant_bits(segment_array, num_least_significant_bits)
-  #print(f"Tamaño arreglo bits menos significativos (Capacidad en bits): {len(least_significant_bits)}")
-  
-  
-  if len(least_significant_bits) < len(message_bits):
-    raise ValueError("El mensaje es muy largo para ser insertado en el audio")
-  
-  for i in range(len(message_bits)):
-    # Obtener el i-ésimo segmento de audio y convertirlo a binario de 16 bits
-    sample_bin = format(segment_array[i], 'b').zfill(16)
-    print(f"Segmento {i} original: {sample_bin}")
-    # Obtener los bits menos significativos del i-ésimo segmento de audio
-    lsb = least_significant_bits[i]
-    # Reemplazar el bit menos significativo del i-ésimo segmento de audio por el i-ésimo bit del mensaje    
-    modified_sample_bin = sample_bin[:-len(lsb)] + message_bits[i]
-    # Convertir el i-ésimo segmento de audio modificado a entero
-    modified_sample = int(modified_sample_bin, 2)
-    # Actualizar el i-ésimo segmento de audio en el arreglo de segmentos de audio modificados
-    modified_segment_array[i] = modified_sample
+  # Limpiar los bits menos significativos de todo el tramo objetivo y establecer los bits del mensaje en una sola operación.
+  # Se opera en complemento a dos, por lo que las muestras negativas conservan su signo.
+  escribir_bits_lsb(modified_segment_array, posiciones, message_bits, num_least_significant_bits)
   return modified_segment_array
 
-def insertar_mensaje_segmento_lsb_random(segment_array, message_bits, num_least_significant_bits=1):
-  """Insertar un mensaje en los bits menos significativos de un arreglo de segmentos de audio.
+def insertar_mensaje_segmento_lsb_random(segment_array, message_bits, num_least_significant_bits=1, parametros_caos=None):
+  """Insertar un mensaje en los bits menos significativos de un arreglo de segmentos de audio,
+  en posiciones elegidas por una secuencia caótica sobre todas las muestras disponibles.
 
   Args:
       segment_array (numpy.array): Arreglo de segmentos de audio en formato de 16 bits (int16)
-      message_bits (str): Cadena de bits con el mensaje a insertar en los segmentos de audio
-      num_least_significant_bits (int, optional): Número de bits menos significativos a utilizar para insertar el mensaje. Defaults to 1.
+      message_bits (CargaBits | str): Carga de bits empaquetada (o cadena de bits) con el mensaje a insertar en los segmentos de audio
+      num_least_significant_bits (int, optional): Número de bits menos significativos a utilizar para insertar el mensaje (1 a 4),
+        cada muestra guarda ese número de bits del mensaje. Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
 
   Returns:
       numpy.array: Arreglo de segmentos de audio con el mensaje esteganografiado
@@ -87,44 +466,116 @@ def insertar_mensaje_segmento_lsb_random(segment_array, message_bits, num_least_
   Raises:
       ValueError: Si el mensaje es muy largo para ser insertado en el audio
   """
-  #print("Mensaje original", message_bits)
+  # Generar las posiciones aleatorias sobre todo el segmento (sin repeticiones),
+  # solo se necesitan tantas posiciones como muestras ocupe el mensaje
+  posiciones = calcular_posiciones(len(segment_array), len(message_bits), num_least_significant_bits, False, parametros_caos)
   modified_segment_array = np.copy(segment_array)
-  
-  # Obtener los bits menos significativos de cada segmento de audio
-  least_significant_bits = get_least_significant_bits(segment_array, num_least_significant_bits)
-  #print(f"Tamaño arreglo bits menos significativos (Capacidad en bits): {len(least_significant_bits)}")
-  #print(f"Tamaño mensaje: {len(message_bits)}")
-  #print("Least significant bits", type(least_significant_bits))
-  
-  secuencia_aleatoria = generar_secuencia_aleatoria(
-                              ChaosMod.X0.value,
-                              ChaosMod.R.value,
-                              ChaosMod.N_WARMUP.value,
-                              0,
-                              len(message_bits),
-                              'int')
-  
-  # print("Secuencia aleatoria generada", secuencia_aleatoria)
-  # print("Tamaño secuencia aleatoria", len(secuencia_aleatoria))
-  
-  if len(least_significant_bits) < len(message_bits):
-    raise ValueError("El mensaje es muy largo para ser insertado en el audio")
-  
-  # Insertar el mensaje en los bits menos significativos de los segmentos de audio
-  # en las posiciones aleatorias generadas de la secuencia aleatoria
-  for i, bit_index in enumerate(secuencia_aleatoria):
-    # Obtener el i-ésimo segmento de audio y convertirlo a binario de 16 bits
-    sample_bin = format(segment_array[i], 'b').zfill(16)
-    # Obtener los bits menos significativos del i-ésimo segmento de audio
-    lsb = least_significant_bits[bit_index]
-    # Reemplazar el bit menos significativo del i-ésimo segmento de audio por el i-ésimo bit del mensaje    
-    modified_sample_bin = sample_bin[:-len(lsb)] + message_bits[i]
-    # Convertir el i-ésimo segmento de audio modificado a entero
-    modified_sample = int(modified_sample_bin, 2)
-    # Actualizar el i-ésimo segmento de audio en el arreglo de segmentos de audio modificados
-    modified_segment_array[i] = modified_sample
-    # print(f"Posicion aleatoria: {bit_index} - Sample bin: {sample_bin} - bit menos significativo actual: {lsb} - bit menos significativo nuevo: {message_bits[bit_index]} - segmento modificado: {modified_sample_bin}")
-    
-  # print("SEGMENTO MODIFICADO",modified_segment_array)
-  
-  return modified_segment_array
\ No newline at end of file
+  # Insertar los bits del mensaje en las posiciones de la secuencia aleatoria
+  # con una sola lectura (gather) y una sola escritura (scatter) sobre el arreglo
+  escribir_bits_lsb(modified_segment_array, posiciones, message_bits, num_least_significant_bits)
+  return modified_segment_array
+
+def calcular_posiciones_canales(n_frames, n_canales, n_bits, canales=None, num_least_significant_bits=1, sequential=True, parametros_caos=None):
+  """Calcular las posiciones (índices en el arreglo intercalado del segmento) que contienen el mensaje al repartirlo entre canales.
+    El portador es la vista frames × canales elegidos: la posición lógica p corresponde al frame p // C y al canal canales[p % C],
+    es decir, al índice intercalado frame * n_canales + canal, sin reordenar ni copiar el audio.
+
+  Args:
+      n_frames (int): Número de frames del segmento
+      n_canales (int): Número de canales del audio
+      n_bits (int): Longitud del mensaje en bits
+      canales (list, optional): Canales que transportan el mensaje (distintos, entre 0 y n_canales - 1). Defaults to None (todos).
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+      sequential (bool, optional): Posiciones consecutivas (True) o caóticas (False). Defaults to True.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      slice | numpy.array: Rebanada (secuencial sobre todos los canales) o arreglo de índices intercalados de las muestras usadas
+
+  Raises:
+      ValueError: Si los canales no son válidos o el mensaje es muy largo para ser insertado en los canales elegidos
+  """
+  if canales is None:
+    canales = range(n_canales)
+  canales = np.asarray(canales, dtype=np.intp)
+  if canales.ndim != 1 or len(canales) == 0 or canales.min() < 0 or canales.max() >= n_canales or len(np.unique(canales)) != len(canales):
+    raise ValueError("Los canales deben ser distintos y estar entre 0 y n_canales - 1")
+  posiciones = calcular_posiciones(n_frames * len(canales), n_bits, num_least_significant_bits, sequential, parametros_caos)
+  if isinstance(posiciones, slice):
+    # Con todos los canales en su orden la vista intercalada ya es el portador
+    if np.array_equal(canales, np.arange(n_canales)):
+      return posiciones
+    posiciones = np.arange(posiciones.start, posiciones.stop, dtype=np.intp)
+  frames, indice_canal = np.divmod(posiciones, len(canales))
+  return frames * n_canales + canales[indice_canal]
+
+def segmento_intercalado(arreglo, inicio_frame, fin_frame, n_canales=None):
+  """Obtener la vista plana (intercalada) de los frames [inicio_frame, fin_frame) de un audio multicanal, sin copia.
+
+  Args:
+      arreglo (numpy.array): Audio intercalado (1-D) o con forma (frames, canales)
+      inicio_frame (int): Primer frame del segmento
+      fin_frame (int): Fin (exclusivo) del segmento, en frames
+      n_canales (int, optional): Número de canales. Defaults to None (arreglo.shape[1] o 1 si es 1-D).
+
+  Returns:
+      tuple: (vista 1-D de las muestras del segmento, número de canales)
+  """
+  if n_canales is None:
+    n_canales = arreglo.shape[1] if arreglo.ndim == 2 else 1
+  # reshape de un arreglo contiguo (o np.memmap) es una vista: frame * n_canales + canal
+  intercalado = arreglo.reshape(-1)
+  return intercalado[inicio_frame * n_canales:fin_frame * n_canales], n_canales
+
+def insertar_mensaje_multicanal(audio_array, message_bits, inicio_frame, fin_frame, n_canales=None, canales=None, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Insertar un mensaje repartido entre los canales de un audio (todos o un subconjunto), tratando los frames × canales como portador.
+    En estéreo (o 5.1) la capacidad por segundo se multiplica por el número de canales usados.
+
+  Args:
+      audio_array (numpy.array): Audio intercalado (1-D, como el de cargar_archivo_wav) o con forma (frames, canales)
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      inicio_frame (int): Primer frame del segmento donde se oculta el mensaje
+      fin_frame (int): Fin (exclusivo) del segmento, en frames
+      n_canales (int, optional): Número de canales del audio intercalado. Defaults to None (audio_array.shape[1] o 1).
+      canales (list, optional): Canales que transportan el mensaje. Defaults to None (todos).
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      numpy.array: Copia del audio (misma forma) con el mensaje esteganografiado
+
+  Raises:
+      ValueError: Si los canales no son válidos o el mensaje es muy largo para ser insertado en el segmento
+  """
+  modified_audio_array = np.copy(audio_array)
+  segmento, n_canales = segmento_intercalado(modified_audio_array, inicio_frame, fin_frame, n_canales)
+  posiciones = calcular_posiciones_canales(fin_frame - inicio_frame, n_canales, len(message_bits), canales,
+                                           num_least_significant_bits, sequential, parametros_caos)
+  # Escribir en la vista del segmento: los cambios quedan en la copia del audio
+  escribir_bits_lsb(segmento, posiciones, message_bits, num_least_significant_bits)
+  return modified_audio_array
+
+def reporte_psnr_profundidad(segment_array, message_bits, profundidades=(1, 2, 3, 4), sequential=True):
+  """Insertar el mismo mensaje con distintas profundidades k (bits por muestra) y reportar la calidad (PSNR)
+    frente a la cantidad de muestras usadas, para elegir el compromiso entre calidad y densidad.
+
+  Args:
+      segment_array (numpy.array): Arreglo de segmentos de audio
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      profundidades (tuple, optional): Valores de k a evaluar. Defaults to (1, 2, 3, 4).
+      sequential (bool, optional): Inserción secuencial o aleatoria. Defaults to True.
+
+  Returns:
+      dict: Para cada k, un diccionario con las muestras usadas, el MSE y el PSNR
+  """
+  reporte = {}
+  for k in profundidades:
+    if sequential:
+      modificado = insertar_mensaje_segmento_lsb_sequential(segment_array, message_bits, k)
+    else:
+      modificado = insertar_mensaje_segmento_lsb_random(segment_array, message_bits, k)
+    print(f"Bits por muestra (k): {k}")
+    mse, psnr = mse_psnr(segment_array, modificado)
+    reporte[k] = {"muestras": -(-len(message_bits) // k), "mse": mse, "psnr": psnr}
+  return reporte
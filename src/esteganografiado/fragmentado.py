@@ -0,0 +1,158 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from src.utils.utils import CargaBits, bits_to_array, extraer_planos_bits
+from src.utils.chaos_mod_enum import ChaosMod
+from src.esteganografiado.esteganografiar import calcular_posiciones, escribir_bits_lsb
+
+def limites_fragmentos(inicio_segmento, fin_segmento, n_fragmentos):
+  """Dividir un segmento en n_fragmentos segmentos disjuntos y contiguos de tamaño similar
+
+  Args:
+      inicio_segmento (int): Inicio del segmento
+      fin_segmento (int): Fin (exclusivo) del segmento
+      n_fragmentos (int): Número de fragmentos
+
+  Returns:
+      list: Lista de tuplas (inicio, fin) de cada fragmento
+  """
+  bordes = np.linspace(inicio_segmento, fin_segmento, n_fragmentos + 1).astype(np.int64)
+  return [(int(bordes[i]), int(bordes[i + 1])) for i in range(n_fragmentos)]
+
+def parametros_caos_fragmento(parametros_caos, indice, desplazamiento):
+  """Obtener los parámetros de la subsecuencia caótica de un fragmento: la misma órbita, adelantada indice * desplazamiento
+    iteraciones, de modo que cada fragmento usa un tramo distinto de la órbita
+
+  Args:
+      parametros_caos (tuple): (x0, r, n_warmup) de la secuencia caótica (None para los valores de ChaosMod)
+      indice (int): Índice del fragmento
+      desplazamiento (int): Iteraciones entre el inicio de dos subsecuencias consecutivas
+
+  Returns:
+      tuple: (x0, r, n_warmup) del fragmento
+  """
+  if parametros_caos is None:
+    parametros_caos = (ChaosMod.X0.value, ChaosMod.R.value, ChaosMod.N_WARMUP.value)
+  x0, r, n_warmup = parametros_caos
+  return (x0, r, n_warmup + indice * desplazamiento)
+
+def _planificar(inicio_segmento, fin_segmento, n_bits, n_fragmentos, parametros_caos):
+  """Calcular los límites, los bits y los parámetros caóticos de cada fragmento"""
+  limites = limites_fragmentos(inicio_segmento, fin_segmento, n_fragmentos)
+  cortes = np.linspace(0, n_bits, n_fragmentos + 1).astype(np.int64)
+  # Cada subsecuencia empieza después del tramo de órbita que usa la anterior (el fragmento más largo)
+  desplazamiento = max(fin - inicio for inicio, fin in limites)
+  return [(limites[i], (int(cortes[i]), int(cortes[i + 1])), parametros_caos_fragmento(parametros_caos, i, desplazamiento))
+          for i in range(n_fragmentos)]
+
+def _vista_compartida(nombre, forma, tipo):
+  """Adjuntarse a un bloque de memoria compartida y exponerlo como arreglo (sin copia)"""
+  memoria = shared_memory.SharedMemory(name=nombre)
+  return memoria, np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+
+def _insertar_fragmento(nombre, forma, tipo, limites, bits, sequential, num_least_significant_bits, parametros_caos):
+  """Insertar (en el lugar) los bits de un fragmento en su segmento del audio compartido"""
+  memoria, audio = _vista_compartida(nombre, forma, tipo)
+  segmento = audio[limites[0]:limites[1]]
+  try:
+    posiciones = calcular_posiciones(len(segmento), len(bits), num_least_significant_bits, sequential, parametros_caos)
+    escribir_bits_lsb(segmento, posiciones, bits, num_least_significant_bits)
+  finally:
+    # Liberar las vistas antes de cerrar la memoria compartida
+    audio = segmento = None
+    memoria.close()
+
+def _extraer_fragmento(nombre, forma, tipo, limites, n_bits, sequential, num_least_significant_bits, parametros_caos):
+  """Extraer los bits de un fragmento de su segmento del audio compartido"""
+  memoria, audio = _vista_compartida(nombre, forma, tipo)
+  segmento = audio[limites[0]:limites[1]]
+  try:
+    posiciones = calcular_posiciones(len(segmento), n_bits, num_least_significant_bits, sequential, parametros_caos)
+    return extraer_planos_bits(segmento[posiciones], num_least_significant_bits).ravel()[:n_bits].copy()
+  finally:
+    # Liberar las vistas antes de cerrar la memoria compartida
+    audio = segmento = None
+    memoria.close()
+
+def _ejecutar(funcion, tareas, n_procesos):
+  """Ejecutar las tareas en un grupo de procesos (o en el proceso actual si n_procesos es 1), en orden"""
+  if n_procesos == 1:
+    return [funcion(*tarea) for tarea in tareas]
+  with ProcessPoolExecutor(max_workers=n_procesos) as executor:
+    futuros = [executor.submit(funcion, *tarea) for tarea in tareas]
+    return [futuro.result() for futuro in futuros]
+
+def insertar_mensaje_fragmentado(audio_array, message_bits, inicio_segmento, fin_segmento, n_fragmentos, sequential=True,
+                                 num_least_significant_bits=1, parametros_caos=None, n_procesos=None):
+  """Insertar un mensaje dividido en n_fragmentos fragmentos, cada uno en un segmento disjunto del audio y con su propia
+    subsecuencia caótica. Los fragmentos se insertan en paralelo por un grupo de procesos que escriben sobre vistas
+    de una sola copia del audio en memoria compartida.
+
+  Args:
+      audio_array (numpy.array): Arreglo de audio
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      inicio_segmento (int): Inicio de la región que se divide en fragmentos
+      fin_segmento (int): Fin (exclusivo) de la región que se divide en fragmentos
+      n_fragmentos (int): Número de fragmentos (y de segmentos disjuntos)
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False) en cada fragmento. Defaults to True.
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica base. Defaults to None (valores de ChaosMod).
+      n_procesos (int, optional): Número de procesos. Defaults to None (uno por núcleo).
+
+  Returns:
+      numpy.array: Copia del audio con el mensaje esteganografiado
+
+  Raises:
+      ValueError: Si algún fragmento es muy largo para ser insertado en su segmento
+  """
+  bits = bits_to_array(message_bits)
+  plan = _planificar(inicio_segmento, fin_segmento, len(bits), n_fragmentos, parametros_caos)
+  # Validar la capacidad de todos los fragmentos antes de lanzar los procesos
+  for (inicio, fin), (a, b), _ in plan:
+    calcular_posiciones(fin - inicio, b - a, num_least_significant_bits)
+  memoria = shared_memory.SharedMemory(create=True, size=max(1, audio_array.nbytes))
+  try:
+    compartido = np.ndarray(audio_array.shape, dtype=audio_array.dtype, buffer=memoria.buf)
+    compartido[...] = audio_array
+    tareas = [(memoria.name, audio_array.shape, audio_array.dtype.str, limites, bits[a:b], sequential, num_least_significant_bits, caos)
+              for limites, (a, b), caos in plan]
+    _ejecutar(_insertar_fragmento, tareas, n_procesos)
+    modified_audio_array = compartido.copy()
+  finally:
+    compartido = None
+    memoria.close()
+    memoria.unlink()
+  return modified_audio_array
+
+def extraer_mensaje_fragmentado(audio_array, message_length, inicio_segmento, fin_segmento, n_fragmentos, sequential=True,
+                                num_least_significant_bits=1, parametros_caos=None, n_procesos=None):
+  """Extraer en paralelo un mensaje insertado con insertar_mensaje_fragmentado y unir sus fragmentos en orden
+
+  Args:
+      audio_array (numpy.array): Arreglo de audio con el mensaje esteganografiado
+      message_length (int): Longitud del mensaje a extraer en bits
+      inicio_segmento (int): Inicio de la región dividida en fragmentos
+      fin_segmento (int): Fin (exclusivo) de la región dividida en fragmentos
+      n_fragmentos (int): Número de fragmentos
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica base. Defaults to None (valores de ChaosMod).
+      n_procesos (int, optional): Número de procesos. Defaults to None (uno por núcleo).
+
+  Returns:
+      tuple: Tupla con los bits extraídos (CargaBits) y el mensaje extraído (bytes)
+  """
+  plan = _planificar(inicio_segmento, fin_segmento, message_length, n_fragmentos, parametros_caos)
+  memoria = shared_memory.SharedMemory(create=True, size=max(1, audio_array.nbytes))
+  try:
+    compartido = np.ndarray(audio_array.shape, dtype=audio_array.dtype, buffer=memoria.buf)
+    compartido[...] = audio_array
+    compartido = None
+    tareas = [(memoria.name, audio_array.shape, audio_array.dtype.str, limites, b - a, sequential, num_least_significant_bits, caos)
+              for limites, (a, b), caos in plan]
+    fragmentos = _ejecutar(_extraer_fragmento, tareas, n_procesos)
+  finally:
+    memoria.close()
+    memoria.unlink()
+  extracted_bits = CargaBits.desde_bits(np.concatenate(fragmentos))
+  return extracted_bits, extracted_bits.a_bytes()
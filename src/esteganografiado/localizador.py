@@ -0,0 +1,122 @@
+import numpy as np
+from src.utils.utils import CargaBits, bits_to_array, extraer_planos_bits
+from src.esteganografiado.esteganografiar import abrir_wav_memmap
+from src.esteganografiado.trama import MAGIA_TRAMA, VERSION_TRAMA, extraer_trama_segmento
+
+# Tamaño mínimo de cada FFT y muestras procesadas por bloque (el resto del archivo no se lee a la vez)
+TAMANO_FFT_LOCALIZADOR = 1 << 15
+MUESTRAS_POR_BLOQUE_LOCALIZADOR = 1 << 20
+
+def preambulo_trama(num_least_significant_bits=1):
+  """Obtener el preámbulo conocido de una trama: magia, versión y profundidad (primeros 6 bytes de la cabecera)
+
+  Args:
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra con los que se insertó la trama. Defaults to 1.
+
+  Returns:
+      CargaBits: Bits del preámbulo
+  """
+  return CargaBits.desde_bytes(MAGIA_TRAMA + bytes([VERSION_TRAMA, num_least_significant_bits]))
+
+def localizar_preambulo(audio_array, preambulo=None, num_least_significant_bits=1, max_errores=0,
+                        tamano_fft=TAMANO_FFT_LOCALIZADOR, muestras_por_bloque=MUESTRAS_POR_BLOQUE_LOCALIZADOR):
+  """Buscar un preámbulo conocido en el plano de bits menos significativos de todo el audio, mediante correlación cruzada por FFT.
+    Los bits se representan como ±1, por lo que la correlación en un desplazamiento vale len(preambulo) - 2 * (bits distintos).
+    El audio se recorre por bloques de muestras y cada bloque se divide en ventanas solapadas (overlap-save)
+    que se transforman juntas con una sola llamada a rfft, con costo O(n log n) y memoria acotada por el bloque.
+
+  Args:
+      audio_array (numpy.array): Audio intercalado (1-D o (frames, canales)); puede ser un np.memmap
+      preambulo (CargaBits | str, optional): Bits a buscar. Defaults to None (preámbulo de la trama, ver preambulo_trama).
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (k); solo se consideran desplazamientos
+        alineados a una muestra. Defaults to 1.
+      max_errores (int, optional): Bits distintos tolerados en el preámbulo. Defaults to 0.
+      tamano_fft (int, optional): Tamaño mínimo de cada FFT. Defaults to 2**15.
+      muestras_por_bloque (int, optional): Muestras procesadas por bloque. Defaults to 2**20.
+
+  Returns:
+      tuple: (desplazamientos candidatos en muestras, bits coincidentes de cada uno), ordenados de mayor a menor coincidencia
+  """
+  k = num_least_significant_bits
+  if preambulo is None:
+    preambulo = preambulo_trama(k)
+  patron = 2.0 * bits_to_array(preambulo) - 1.0
+  longitud = len(patron)
+  tamano = tamano_fft
+  while tamano < 2 * longitud:
+    tamano *= 2
+  # Cada ventana de tamaño N produce N - L + 1 correlaciones sin solapamiento circular
+  paso = tamano - longitud + 1
+  espectro_patron = np.conj(np.fft.rfft(patron, tamano))
+  umbral = longitud - 2 * max_errores
+  # Muestras extra al final de cada bloque para cubrir los preámbulos que empiezan al final del bloque
+  solape = -(-longitud // k) - 1
+  muestras = audio_array.reshape(-1)
+  candidatos, coincidencias = [], []
+  for inicio in range(0, len(muestras), muestras_por_bloque):
+    bloque = muestras[inicio:inicio + muestras_por_bloque + solape]
+    senal = 2.0 * extraer_planos_bits(bloque, k).ravel() - 1.0
+    n_desplazamientos = len(senal) - longitud + 1
+    if n_desplazamientos <= 0:
+      break
+    n_ventanas = -(-n_desplazamientos // paso)
+    relleno = np.zeros((n_ventanas - 1) * paso + tamano)
+    relleno[:len(senal)] = senal
+    # Ventanas solapadas como vista (sin copia) y una sola FFT por lote de ventanas
+    ventanas = np.lib.stride_tricks.sliding_window_view(relleno, tamano)[::paso]
+    correlacion = np.fft.irfft(np.fft.rfft(ventanas, axis=1) * espectro_patron, tamano, axis=1)[:, :paso]
+    correlacion = correlacion.ravel()[:n_desplazamientos]
+    # Solo desplazamientos alineados a una muestra y que empiezan dentro del bloque
+    correlacion = correlacion[::k][:muestras_por_bloque]
+    indices = np.flatnonzero(correlacion > umbral - 0.5)
+    candidatos.append(inicio + indices)
+    coincidencias.append(np.rint((longitud + correlacion[indices]) / 2).astype(np.int64))
+  if not candidatos:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+  candidatos = np.concatenate(candidatos).astype(np.int64)
+  coincidencias = np.concatenate(coincidencias)
+  orden = np.lexsort((candidatos, -coincidencias))
+  return candidatos[orden], coincidencias[orden]
+
+def recuperar_trama(audio_array, num_least_significant_bits=1, max_errores=0, parametros_caos=None, max_candidatos=16):
+  """Recuperar a ciegas una trama insertada secuencialmente en un desplazamiento desconocido (por ejemplo tras recortar el audio).
+    Se localizan los candidatos con localizar_preambulo y se extrae la trama en cada uno hasta que su CRC32 sea correcto.
+    Las tramas aleatorias dependen de los límites del segmento, por lo que no se pueden localizar.
+
+  Args:
+      audio_array (numpy.array): Audio intercalado (1-D o (frames, canales)); puede ser un np.memmap
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+      max_errores (int, optional): Bits distintos tolerados en el preámbulo. Defaults to 0.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) cuya huella guarda la trama. Defaults to None (valores de ChaosMod).
+      max_candidatos (int, optional): Número máximo de candidatos a verificar. Defaults to 16.
+
+  Returns:
+      tuple | None: (desplazamiento en muestras, bits extraídos (CargaBits), mensaje extraído (bytes)) o None si no se encontró
+  """
+  muestras = audio_array.reshape(-1)
+  candidatos, _ = localizar_preambulo(muestras, None, num_least_significant_bits, max_errores)
+  for desplazamiento in candidatos[:max_candidatos]:
+    try:
+      extracted_bits, extracted_message, correcto = extraer_trama_segmento(
+        muestras[desplazamiento:], True, num_least_significant_bits, parametros_caos)
+    except ValueError:
+      continue
+    if correcto:
+      return int(desplazamiento), extracted_bits, extracted_message
+  return None
+
+def recuperar_trama_wav(ruta_archivo, num_least_significant_bits=1, max_errores=0, parametros_caos=None, max_candidatos=16):
+  """Recuperar a ciegas una trama de un archivo WAV mapeado en memoria (ver recuperar_trama)
+
+  Args:
+      ruta_archivo (str): Ruta del archivo WAV esteganografiado
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+      max_errores (int, optional): Bits distintos tolerados en el preámbulo. Defaults to 0.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) cuya huella guarda la trama. Defaults to None (valores de ChaosMod).
+      max_candidatos (int, optional): Número máximo de candidatos a verificar. Defaults to 16.
+
+  Returns:
+      tuple | None: (desplazamiento en muestras, bits extraídos (CargaBits), mensaje extraído (bytes)) o None si no se encontró
+  """
+  muestras, _ = abrir_wav_memmap(ruta_archivo, 'r')
+  return recuperar_trama(muestras, num_least_significant_bits, max_errores, parametros_caos, max_candidatos)
@@ -0,0 +1,146 @@
+import zlib
+import struct
+import numpy as np
+from collections import namedtuple
+from src.utils.utils import CargaBits, extraer_planos_bits
+from src.utils.chaos_mod_enum import ChaosMod
+from src.esteganografiado.esteganografiar import calcular_posiciones, escribir_bits_lsb
+
+# Identificador de la trama y versión del formato
+MAGIA_TRAMA = b'ESTG'
+VERSION_TRAMA = 1
+
+# Cabecera: magia (4 bytes), versión (1), profundidad k (1), longitud de la carga en bits (4),
+# huella de los parámetros caóticos (4) y CRC32 de la cabecera y la carga (4)
+FORMATO_CABECERA_TRAMA = '<4sBBIII'
+LONGITUD_CABECERA_TRAMA = struct.calcsize(FORMATO_CABECERA_TRAMA)
+BITS_CABECERA_TRAMA = LONGITUD_CABECERA_TRAMA * 8
+
+# Campos de la cabecera de una trama
+CabeceraTrama = namedtuple('CabeceraTrama', ['version', 'profundidad', 'n_bits', 'huella', 'crc'])
+
+def huella_caos(parametros_caos=None):
+  """Calcular la huella (CRC32) de los parámetros de la secuencia caótica, para detectar al extraer
+    que se usan los mismos parámetros que al insertar sin guardar los parámetros en el audio.
+
+  Args:
+      parametros_caos (tuple, optional): (x0, r, n_warmup). Defaults to None (valores de ChaosMod).
+
+  Returns:
+      int: Huella de 32 bits
+  """
+  if parametros_caos is None:
+    parametros_caos = (ChaosMod.X0.value, ChaosMod.R.value, ChaosMod.N_WARMUP.value)
+  x0, r, n_warmup = parametros_caos
+  return zlib.crc32(struct.pack('<ddq', float(x0), float(r), int(n_warmup)))
+
+def empaquetar_trama(message_bits, num_least_significant_bits=1, parametros_caos=None):
+  """Anteponer a la carga la cabecera de la trama (magia, versión, longitud, huella caótica y CRC32),
+    para que la extracción no necesite conocer la longitud del mensaje ni el mensaje original.
+
+  Args:
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra con los que se insertará la trama. Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      CargaBits: Trama (cabecera seguida de la carga)
+  """
+  carga = CargaBits.desde(message_bits)
+  datos_carga = carga.a_bytes()
+  sin_crc = struct.pack(FORMATO_CABECERA_TRAMA[:-1], MAGIA_TRAMA, VERSION_TRAMA, num_least_significant_bits,
+                        len(carga), huella_caos(parametros_caos))
+  cabecera = sin_crc + struct.pack('<I', zlib.crc32(datos_carga, zlib.crc32(sin_crc)))
+  return CargaBits(np.frombuffer(cabecera + datos_carga, dtype=np.uint8), BITS_CABECERA_TRAMA + len(carga))
+
+def leer_cabecera_trama(bits_cabecera):
+  """Decodificar y validar la cabecera de una trama
+
+  Args:
+      bits_cabecera (CargaBits): Primeros BITS_CABECERA_TRAMA bits de la trama
+
+  Returns:
+      CabeceraTrama: Campos de la cabecera
+
+  Raises:
+      ValueError: Si la magia o la versión no corresponden a una trama válida
+  """
+  magia, version, profundidad, n_bits, huella, crc = struct.unpack(FORMATO_CABECERA_TRAMA, bits_cabecera.a_bytes()[:LONGITUD_CABECERA_TRAMA])
+  if magia != MAGIA_TRAMA:
+    raise ValueError("No se encontró una trama en el segmento")
+  if version != VERSION_TRAMA:
+    raise ValueError(f"Versión de trama no soportada: {version}")
+  return CabeceraTrama(version, profundidad, n_bits, huella, crc)
+
+def verificar_trama(cabecera, carga):
+  """Verificar el CRC32 de una trama extraída
+
+  Args:
+      cabecera (CabeceraTrama): Cabecera de la trama
+      carga (CargaBits): Carga extraída
+
+  Returns:
+      bool: True si el CRC32 de la cabecera y la carga coincide con el guardado
+  """
+  sin_crc = struct.pack(FORMATO_CABECERA_TRAMA[:-1], MAGIA_TRAMA, cabecera.version, cabecera.profundidad,
+                        cabecera.n_bits, cabecera.huella)
+  return zlib.crc32(carga.a_bytes(), zlib.crc32(sin_crc)) == cabecera.crc
+
+def insertar_trama_segmento(segment_array, message_bits, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Insertar un mensaje con su cabecera de trama en los bits menos significativos de un segmento de audio
+
+  Args:
+      segment_array (numpy.array): Arreglo de segmentos de audio
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      numpy.array: Arreglo de segmentos de audio con la trama esteganografiada
+
+  Raises:
+      ValueError: Si la trama es muy larga para ser insertada en el segmento
+  """
+  trama = empaquetar_trama(message_bits, num_least_significant_bits, parametros_caos)
+  posiciones = calcular_posiciones(len(segment_array), len(trama), num_least_significant_bits, sequential, parametros_caos)
+  modified_segment_array = np.copy(segment_array)
+  escribir_bits_lsb(modified_segment_array, posiciones, trama, num_least_significant_bits)
+  return modified_segment_array
+
+def extraer_trama_segmento(segment_array, sequential=True, num_least_significant_bits=1, parametros_caos=None):
+  """Extraer a ciegas un mensaje con cabecera de trama: se leen primero las muestras de la cabecera y,
+    si es válida, solo las muestras adicionales que ocupa la carga. Sin cabecera válida se termina sin leer la carga.
+    Las posiciones de la cabecera son un prefijo de las de la trama completa (secuencial y aleatorio).
+
+  Args:
+      segment_array (numpy.array): Arreglo de segmentos de audio con la trama esteganografiada (sirve con np.memmap)
+      sequential (bool, optional): Inserción secuencial (True) o aleatoria (False). Defaults to True.
+      num_least_significant_bits (int, optional): Número de bits del mensaje guardados en cada muestra (1 a 4). Defaults to 1.
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      tuple: Tupla con los bits extraídos (CargaBits), el mensaje extraído (bytes) y si el CRC32 es correcto (bool)
+
+  Raises:
+      ValueError: Si no hay una cabecera válida, fue insertada con otra profundidad o parámetros caóticos,
+        o su longitud excede la capacidad del segmento
+  """
+  k = num_least_significant_bits
+  # Leer solo las muestras de la cabecera
+  posiciones_cabecera = calcular_posiciones(len(segment_array), BITS_CABECERA_TRAMA, k, sequential, parametros_caos)
+  planos = extraer_planos_bits(segment_array[posiciones_cabecera], k).ravel()
+  cabecera = leer_cabecera_trama(CargaBits.desde_bits(planos[:BITS_CABECERA_TRAMA]))
+  if cabecera.profundidad != k:
+    raise ValueError(f"La trama fue insertada con {cabecera.profundidad} bits por muestra")
+  if cabecera.huella != huella_caos(parametros_caos):
+    raise ValueError("La trama fue insertada con otros parámetros caóticos")
+  # Leer solo las muestras adicionales que ocupa la carga
+  posiciones = calcular_posiciones(len(segment_array), BITS_CABECERA_TRAMA + cabecera.n_bits, k, sequential, parametros_caos)
+  if isinstance(posiciones, slice):
+    posiciones_carga = slice(-(-BITS_CABECERA_TRAMA // k), posiciones.stop)
+  else:
+    posiciones_carga = posiciones[-(-BITS_CABECERA_TRAMA // k):]
+  planos = np.concatenate([planos, extraer_planos_bits(segment_array[posiciones_carga], k).ravel()])
+  extracted_bits = CargaBits.desde_bits(planos[BITS_CABECERA_TRAMA:BITS_CABECERA_TRAMA + cabecera.n_bits])
+  return extracted_bits, extracted_bits.a_bytes(), verificar_trama(cabecera, extracted_bits)
@@ -0,0 +1,148 @@
+import numpy as np
+from src.utils.utils import CargaBits, bits_to_array
+from src.utils.caos import generar_llave
+from src.utils.chaos_mod_enum import ChaosMod
+from src.esteganografiado.trama import BITS_CABECERA_TRAMA, leer_cabecera_trama, verificar_trama, huella_caos
+
+# Muestras por trama de análisis (un bit del mensaje por trama)
+TAMANO_TRAMA_TRANSFORMADA = 1024
+
+# Banda media del espectro que transporta el mensaje, como fracción de los coeficientes de la rfft
+BANDA_TRANSFORMADA = (1 / 16, 1 / 4)
+
+# Paso de cuantización (QIM) de la proyección, en unidades de los coeficientes de la rfft: mayor paso, más robustez y más distorsión
+PASO_QIM = 8192.0
+
+def _bins_banda(tamano_trama, banda):
+  """Índices de los coeficientes de la rfft dentro de la banda"""
+  n_bins = tamano_trama // 2 + 1
+  return np.arange(int(banda[0] * n_bins), int(banda[1] * n_bins))
+
+def secuencia_chips(n_tramas, n_chips, parametros_caos=None):
+  """Generar la secuencia de chips ±1 (una fila por trama) a partir del flujo caótico
+
+  Args:
+      n_tramas (int): Número de tramas
+      n_chips (int): Chips por trama (coeficientes de la banda)
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia caótica. Defaults to None (valores de ChaosMod).
+
+  Returns:
+      numpy.array: Matriz (n_tramas, n_chips) de ±1 (float64)
+  """
+  if parametros_caos is None:
+    parametros_caos = (ChaosMod.X0.value, ChaosMod.R.value, ChaosMod.N_WARMUP.value)
+  x0, r, n_warmup = parametros_caos
+  n = n_tramas * n_chips
+  # 8 bits por iteración: la salida de un bit por iteración está sesgada (ver calidad_llave)
+  bits = np.unpackbits(np.asarray(generar_llave(x0, r, n_warmup, -(-n // 8), 8), dtype=np.uint8))[:n]
+  return (2.0 * bits - 1.0).reshape(n_tramas, n_chips)
+
+def _proyecciones(tramas, bins, chips):
+  """Espectro de todas las tramas (una sola rfft) y proyección de la parte real de los coeficientes de la banda sobre los chips"""
+  espectro = np.fft.rfft(tramas, axis=1)
+  return espectro, np.einsum('ij,ij->i', espectro[:, bins].real, chips) / len(bins)
+
+def _tramas(segment_array, n_bits, tamano_trama):
+  """Vista (n_bits, tamano_trama) de las primeras tramas del segmento (intercalado), sin solapamiento"""
+  muestras = segment_array.reshape(-1)
+  if n_bits * tamano_trama > len(muestras):
+    raise ValueError("El mensaje es muy largo para ser insertado en el audio")
+  return muestras[:n_bits * tamano_trama].reshape(n_bits, tamano_trama)
+
+def insertar_mensaje_segmento_transformada(segment_array, message_bits, parametros_caos=None, tamano_trama=TAMANO_TRAMA_TRANSFORMADA,
+                                           paso_qim=PASO_QIM, banda=BANDA_TRANSFORMADA):
+  """Insertar un mensaje en el dominio de la frecuencia: un bit por trama, por cuantización (QIM) de la proyección
+    de los coeficientes de la banda media sobre una secuencia de chips ±1 generada por el flujo caótico (espectro ensanchado).
+    Todas las tramas se transforman con una sola rfft y se modifican con operaciones sobre la matriz (tramas, coeficientes).
+
+  Args:
+      segment_array (numpy.array): Arreglo de segmentos de audio (1-D intercalado o (frames, canales))
+      message_bits (CargaBits | str): Carga de bits con el mensaje
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia de chips. Defaults to None (valores de ChaosMod).
+      tamano_trama (int, optional): Muestras por trama. Defaults to 1024.
+      paso_qim (float, optional): Paso de cuantización de la proyección. Defaults to 8192.
+      banda (tuple, optional): Banda (fracciones de los coeficientes de la rfft) que transporta el mensaje. Defaults to (1/16, 1/4).
+
+  Returns:
+      numpy.array: Arreglo de segmentos de audio con el mensaje esteganografiado (mismo tipo)
+
+  Raises:
+      ValueError: Si el mensaje es muy largo para ser insertado en el audio
+  """
+  bits = bits_to_array(message_bits)
+  modified_segment_array = np.copy(segment_array)
+  if len(bits) == 0:
+    return modified_segment_array
+  tramas = _tramas(segment_array, len(bits), tamano_trama).astype(np.float64)
+  bins = _bins_banda(tamano_trama, banda)
+  chips = secuencia_chips(len(bits), len(bins), parametros_caos)
+  espectro, proyeccion = _proyecciones(tramas, bins, chips)
+  # Llevar la proyección al punto más cercano de la red del bit (b * paso / 2 + k * paso)
+  desplazamiento = bits * (paso_qim / 2)
+  objetivo = np.round((proyeccion - desplazamiento) / paso_qim) * paso_qim + desplazamiento
+  # Como los chips son ±1, sumar delta * chips a la parte real de la banda desplaza la proyección exactamente delta
+  # (la transformada es lineal, por lo que el cambio no depende de la energía de la trama, ni siquiera en silencios)
+  espectro[:, bins] += (objetivo - proyeccion)[:, None] * chips
+  tramas = np.fft.irfft(espectro, tamano_trama, axis=1).ravel()
+  if np.issubdtype(segment_array.dtype, np.integer):
+    limites = np.iinfo(segment_array.dtype)
+    tramas = np.clip(np.rint(tramas), limites.min, limites.max)
+  modified_segment_array.reshape(-1)[:len(tramas)] = tramas.astype(segment_array.dtype)
+  return modified_segment_array
+
+def extraer_mensaje_segmento_transformada(segment_array, message_length, parametros_caos=None, tamano_trama=TAMANO_TRAMA_TRANSFORMADA,
+                                          paso_qim=PASO_QIM, banda=BANDA_TRANSFORMADA):
+  """Extraer un mensaje insertado con insertar_mensaje_segmento_transformada: cada bit es la red (par o impar)
+    más cercana a la proyección de su trama
+
+  Args:
+      segment_array (numpy.array): Arreglo de segmentos de audio con el mensaje esteganografiado
+      message_length (int): Longitud del mensaje a extraer en bits
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia de chips. Defaults to None (valores de ChaosMod).
+      tamano_trama (int, optional): Muestras por trama. Defaults to 1024.
+      paso_qim (float, optional): Paso de cuantización de la proyección. Defaults to 8192.
+      banda (tuple, optional): Banda que transporta el mensaje. Defaults to (1/16, 1/4).
+
+  Returns:
+      tuple: Tupla con los bits extraídos (CargaBits) y el mensaje extraído (bytes)
+
+  Raises:
+      ValueError: Si el mensaje es más largo que la capacidad del audio
+  """
+  tramas = _tramas(segment_array, message_length, tamano_trama).astype(np.float64)
+  bins = _bins_banda(tamano_trama, banda)
+  chips = secuencia_chips(message_length, len(bins), parametros_caos)
+  _, proyeccion = _proyecciones(tramas, bins, chips)
+  # Distancia a la red de los ceros y a la de los unos
+  distancia_0 = np.abs(proyeccion - np.round(proyeccion / paso_qim) * paso_qim)
+  impar = proyeccion - paso_qim / 2
+  distancia_1 = np.abs(impar - np.round(impar / paso_qim) * paso_qim)
+  extracted_bits = CargaBits.desde_bits((distancia_1 < distancia_0).astype(np.uint8))
+  return extracted_bits, extracted_bits.a_bytes()
+
+def extraer_trama_segmento_transformada(segment_array, parametros_caos=None, tamano_trama=TAMANO_TRAMA_TRANSFORMADA,
+                                        paso_qim=PASO_QIM, banda=BANDA_TRANSFORMADA):
+  """Extraer a ciegas una trama (ver src.esteganografiado.trama) insertada en el dominio de la frecuencia:
+    se transforman primero solo las tramas de la cabecera y, si es válida, las de la trama completa
+
+  Args:
+      segment_array (numpy.array): Arreglo de segmentos de audio con la trama esteganografiada
+      parametros_caos (tuple, optional): (x0, r, n_warmup) de la secuencia de chips. Defaults to None (valores de ChaosMod).
+      tamano_trama (int, optional): Muestras por trama. Defaults to 1024.
+      paso_qim (float, optional): Paso de cuantización de la proyección. Defaults to 8192.
+      banda (tuple, optional): Banda que transporta el mensaje. Defaults to (1/16, 1/4).
+
+  Returns:
+      tuple: Tupla con los bits extraídos (CargaBits), el mensaje extraído (bytes) y si el CRC32 es correcto (bool)
+
+  Raises:
+      ValueError: Si no hay una cabecera válida o fue insertada con otros parámetros caóticos
+  """
+  cabecera_bits, _ = extraer_mensaje_segmento_transformada(segment_array, BITS_CABECERA_TRAMA, parametros_caos, tamano_trama, paso_qim, banda)
+  cabecera = leer_cabecera_trama(cabecera_bits)
+  if cabecera.huella != huella_caos(parametros_caos):
+    raise ValueError("La trama fue insertada con otros parámetros caóticos")
+  trama_bits, _ = extraer_mensaje_segmento_transformada(segment_array, BITS_CABECERA_TRAMA + cabecera.n_bits, parametros_caos,
+                                                        tamano_trama, paso_qim, banda)
+  extracted_bits = trama_bits[BITS_CABECERA_TRAMA:]
+  return extracted_bits, extracted_bits.a_bytes(), verificar_trama(cabecera, extracted_bits)
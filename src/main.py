@@ -4,30 +4,34 @@ from src.compresion.descomprimir import descomprimir
 
 # Encriptado de texto
 from src.encriptado.encriptar import xor_encriptado
+from src.encriptado.desencriptar import xor_desencriptado
 
 # Esteganografía en señales de audio
-from src.esteganografiado.esteganografiar import cargar_archivo_wav, guardar_archivo_wav, insertar_mensaje_segmento_lsb_sequential, insertar_mensaje_segmento_lsb_random
-from src.esteganografiado.desesteganografiar import extraer_mensaje_segmento_lsb_sequential, extraer_mensaje_segmento_lsb_random
+from src.esteganografiado.esteganografiar import cargar_archivo_wav, guardar_archivo_wav, obtener_parametros_wav, insertar_mensaje_segmento_lsb_sequential, insertar_mensaje_segmento_lsb_random
+from src.esteganografiado.trama import empaquetar_trama, extraer_trama_segmento, BITS_CABECERA_TRAMA
+from src.esteganografiado.transformada import insertar_mensaje_segmento_transformada, extraer_trama_segmento_transformada, TAMANO_TRAMA_TRANSFORMADA
 
 # Graficación de señales de audio y métricas
 from src.utils.graficas import (plot_audio_waveforms, plot_audio_histograms, plot_audio_spectrograms,
                                plot_audio_difference, plot_resource_usage, plot_execution_times,
                                plot_frequency_distribution, plot_audio_waveforms_librosa, 
-                               plot_attack_results, plot_attack_spectrograms)
+                               plot_attack_results, plot_attack_spectrograms, plot_attack_error_map)
 from src.utils.metricas import (mse_psnr, distorsion, invisibilidad, entropia, correlacion_cruzada, 
                                analisis_componentes, medir_recursos, TimerContextManager)
 
 # Generar llave de encriptación
 from src.utils.caos import generar_llave
+from src.utils.utils import CargaBits
+from src.utils.correccion_errores import MODOS_ECC, codificar_ecc, decodificar_ecc, reporte_ecc
 
 # Enums configuraciones
 from src.utils.chaos_mod_enum import ChaosMod
 
 # Ataques
-from src.utils.ataques import AudioAttacks
+from src.utils.ataques import AudioAttacks, SEMILLA_RUIDO
+from src.utils.cache_ataques import CacheAtaques, DIRECTORIO_CACHE_ATAQUES
 
 import numpy as np
-import wave
 import os
 import sys
 import time
@@ -37,71 +41,115 @@ def cargar_audio(ruta_audio):
   return cargar_archivo_wav(ruta_audio)
 
 def convertir_mensaje_a_bits(mensaje):
-  mensaje_en_bytes = np.array([ord(char) for char in mensaje], dtype=np.uint8)
+  mensaje_en_bytes = mensaje.encode('latin-1')
   longitud_de_llave = len(mensaje_en_bytes)
   llave = generar_llave(
     ChaosMod.X0.value, 
     ChaosMod.R.value, 
     ChaosMod.N_WARMUP.value, 
     longitud_de_llave)
-  mensaje_encriptado = xor_encriptado(mensaje_en_bytes, llave)
-  mensaje_para_paso = "".join([chr(b) for b in mensaje_encriptado])
-  mensaje_bits = ''.join([format(ord(char), '08b') for char in str(mensaje_para_paso)])
+  mensaje_bits = xor_encriptado(CargaBits.desde_bytes(mensaje_en_bytes), llave)
   return mensaje_bits, llave
 
-def insertar_mensaje_en_audio(arreglo_audio_original, mensaje_bits, audio_total = False, sequential = True):
+def limites_segmento(arreglo_audio, audio_total = False):
+  """Obtener el segmento donde se oculta el mensaje: todo el audio o ±22050 muestras alrededor del punto medio
+
+  Args:
+      arreglo_audio (numpy.array): Arreglo de audio
+      audio_total (bool, optional): Usar todo el audio. Defaults to False.
+
+  Returns:
+      tuple: (inicio, fin) del segmento en muestras
+  """
   if audio_total:
-    arreglo_segmento_original = arreglo_audio_original
-    inicio_segmento = 0
-    fin_segmento = len(arreglo_audio_original)
-  else:
-    punto_medio = len(arreglo_audio_original) // 2
-    inicio_segmento = punto_medio - 22050
-    fin_segmento = punto_medio + 22050
-    arreglo_segmento_original = arreglo_audio_original[inicio_segmento:fin_segmento]
+    return 0, len(arreglo_audio)
+  punto_medio = len(arreglo_audio) // 2
+  return max(0, punto_medio - 22050), min(len(arreglo_audio), punto_medio + 22050)
+
+def capacidad_segmento(n_muestras, num_least_significant_bits = 1, transformada = False):
+  """Capacidad en bits de un segmento: num_least_significant_bits bits por muestra, o un bit por trama
+    de TAMANO_TRAMA_TRANSFORMADA muestras en el dominio de la frecuencia
+
+  Args:
+      n_muestras (int): Muestras del segmento
+      num_least_significant_bits (int, optional): Bits del mensaje por muestra. Defaults to 1.
+      transformada (bool, optional): Inserción en el dominio de la frecuencia. Defaults to False.
+
+  Returns:
+      int: Capacidad en bits (incluida la cabecera de la trama)
+  """
+  if transformada:
+    return n_muestras // TAMANO_TRAMA_TRANSFORMADA
+  return n_muestras * num_least_significant_bits
+
+def insertar_mensaje_en_audio(arreglo_audio_original, mensaje_bits, audio_total = False, sequential = True, num_least_significant_bits = 1, transformada = False):
+  inicio_segmento, fin_segmento = limites_segmento(arreglo_audio_original, audio_total)
+  arreglo_segmento_original = arreglo_audio_original[inicio_segmento:fin_segmento]
 
   try:
-    if sequential:
-      arreglo_segmento_modificado = insertar_mensaje_segmento_lsb_sequential(arreglo_segmento_original, mensaje_bits)
+    if transformada:
+      arreglo_segmento_modificado = insertar_mensaje_segmento_transformada(arreglo_segmento_original, mensaje_bits)
+    elif sequential:
+      arreglo_segmento_modificado = insertar_mensaje_segmento_lsb_sequential(arreglo_segmento_original, mensaje_bits, num_least_significant_bits)
     else:
-      arreglo_segmento_modificado = insertar_mensaje_segmento_lsb_random(arreglo_segmento_original, mensaje_bits)
+      arreglo_segmento_modificado = insertar_mensaje_segmento_lsb_random(arreglo_segmento_original, mensaje_bits, num_least_significant_bits)
   except ValueError as e:
     print(f"Error: {e}")
     sys.exit(1)
 
-  arreglo_audio_modificado = np.concatenate((arreglo_audio_original[:inicio_segmento], arreglo_segmento_modificado, arreglo_audio_original[fin_segmento:]))
+  # Copiar el audio una sola vez y reemplazar solo el segmento (evita la copia adicional de np.concatenate)
+  arreglo_audio_modificado = np.copy(arreglo_audio_original)
+  arreglo_audio_modificado[inicio_segmento:fin_segmento] = arreglo_segmento_modificado
   return arreglo_audio_modificado, inicio_segmento, fin_segmento
 
 def guardar_audio_modificado(ruta_audio_modificado, arreglo_audio_modificado, params):
   guardar_archivo_wav(ruta_audio_modificado, arreglo_audio_modificado, params)
 
-def extraer_y_verificar_mensaje(arreglo_audio_modificado, inicio_segmento, fin_segmento, mensaje_bits, llave, sequential = True):
+def extraer_y_verificar_mensaje(arreglo_audio_modificado, inicio_segmento, fin_segmento, llave, sequential = True, num_least_significant_bits = 1, ecc = None, transformada = False):
   arreglo_segmento_extraido = arreglo_audio_modificado[inicio_segmento:fin_segmento]
-  if (sequential):
-    bits_extraidos, mensaje_extraido = extraer_mensaje_segmento_lsb_sequential(arreglo_segmento_extraido, len(mensaje_bits))
-  else:
-    bits_extraidos, mensaje_extraido = extraer_mensaje_segmento_lsb_random(arreglo_segmento_extraido, len(mensaje_bits))
-  
-  extraccion_correcta = mensaje_bits == bits_extraidos
-  
+  # La longitud del mensaje se lee de la cabecera de la trama y la extracción se verifica con su CRC32
+  try:
+    if transformada:
+      bits_extraidos, mensaje_extraido, extraccion_correcta = extraer_trama_segmento_transformada(arreglo_segmento_extraido)
+    else:
+      bits_extraidos, mensaje_extraido, extraccion_correcta = extraer_trama_segmento(arreglo_segmento_extraido, sequential, num_least_significant_bits)
+  except ValueError as e:
+    print(f"Error: {e}")
+    return None
+
+  if ecc is not None:
+    # El CRC32 de la trama protege los bits codificados: si no coincide, el código corrector aún puede recuperar el mensaje,
+    # y el resultado se acepta solo si coincide el CRC32 de los bits decodificados
+    if not extraccion_correcta:
+      print("CRC32 de la trama incorrecto, se corrigen los errores con el código corrector")
+    bits_decodificados, extraccion_correcta = decodificar_ecc(bits_extraidos, ecc)
+    if not extraccion_correcta:
+      print("Error: CRC32 del mensaje decodificado incorrecto, el código corrector no pudo recuperar el mensaje")
+    mensaje_extraido = bits_decodificados.a_bytes()
 
   if extraccion_correcta:
-    mensaje_original_bytes = np.array([ord(c) for c in mensaje_extraido], dtype=np.uint8)
-    mensaje_desencriptado_bytes = xor_encriptado(mensaje_original_bytes, llave)
-    mensaje_desencriptado = "".join([chr(b) for b in mensaje_desencriptado_bytes])
+    mensaje_original_bytes = bytearray(mensaje_extraido)
+    mensaje_desencriptado_bytes = xor_desencriptado(mensaje_original_bytes, llave, out=mensaje_original_bytes)
+    mensaje_desencriptado = mensaje_desencriptado_bytes.tobytes().decode('latin-1')
     return mensaje_desencriptado
   else:
     return None
 
-def ejecutar_ataques(ruta_audio_modificado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential=False):
+def ejecutar_ataques(ruta_audio_modificado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential=False, num_least_significant_bits=1, transformada=False, n_procesos=1, guardar_ataques=False, usar_cache=False):
   """Ejecutar la batería de ataques sobre el audio esteganografiado y evaluar su robustez
   
   Args:
       ruta_audio_modificado (str): Ruta del archivo de audio esteganografiado
       inicio_segmento (int): Inicio del segmento donde está oculto el mensaje 
       fin_segmento (int): Fin del segmento donde está oculto el mensaje
-      mensaje_bits_length (int): Longitud en bits del mensaje oculto
+      mensaje_bits_length (int | CargaBits): Longitud en bits del mensaje oculto (o la carga de bits original)
       sequential (bool): Si el mensaje fue insertado secuencialmente o no
+      num_least_significant_bits (int): Bits del mensaje guardados en cada muestra
+      transformada (bool): Si el mensaje fue insertado en el dominio de la frecuencia
+      n_procesos (int): Número de procesos que ejecutan los ataques en paralelo
+      guardar_ataques (bool): Guardar los audios atacados en attacks_output (por defecto los ataques no escriben archivos)
+      usar_cache (bool): Reutilizar los audios atacados de ejecuciones anteriores (caché en disco direccionada por contenido en
+        .cache_ataques del directorio actual; por defecto desactivada para no escribir archivos)
       
   Returns:
       dict: Resultados de los ataques
@@ -115,25 +163,29 @@ def ejecutar_ataques(ruta_audio_modificado, inicio_segmento, fin_segmento, mensa
   
   # Inicializar el módulo de ataques
   with TimerContextManager("Inicialización módulo de ataques") as timer:
-    attacks = AudioAttacks(ruta_audio_modificado, output_dir)
+    cache = CacheAtaques(os.path.join(os.getcwd(), DIRECTORIO_CACHE_ATAQUES)) if usar_cache else None
+    attacks = AudioAttacks(ruta_audio_modificado, output_dir, guardar=guardar_ataques, cache=cache)
   
   # Ejecutar todos los ataques
   with TimerContextManager("Ejecución de ataques") as timer:
-    resultados = attacks.run_all_attacks(inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
+    resultados = attacks.run_all_attacks(inicio_segmento, fin_segmento, mensaje_bits_length, sequential, num_least_significant_bits, transformada, n_procesos)
   
   print("\n--- Resumen de resultados de ataques ---")
-  ataques_exitosos = sum(1 for resultado in resultados.values() if resultado["exito"])
-  total_ataques = len(resultados)
+  # La verificación sin ataque es solo la referencia de la extracción, no cuenta como ataque
+  ataques = {nombre: resultado for nombre, resultado in resultados.items() if nombre != "sin_ataque"}
+  ataques_exitosos = sum(1 for resultado in ataques.values() if resultado["exito"])
+  total_ataques = len(ataques)
   print(f"Ataques superados: {ataques_exitosos} de {total_ataques} ({ataques_exitosos/total_ataques*100:.1f}%)")
   
   # Generar gráficas de resultados
   plot_attack_results(resultados)
+  plot_attack_error_map(resultados)
   
-  # Generar gráficas de espectrogramas para algunos ataques seleccionados
+  # Generar gráficas de espectrogramas para algunos ataques seleccionados (con caché se reutilizan los de la batería)
   attacked_audios = {
-    "ruido_0.01": attacks.add_noise(0.01)[1],
-    "mp3_64kbps": attacks.compress_decompress("mp3", 64)[1],
-    "filtrado_3000Hz": attacks.low_pass_filter(3000)[1]
+    "ruido_0.01": attacks.aplicar_ataque("add_noise", noise_level=0.01, seed=SEMILLA_RUIDO)[1],
+    "mp3_64kbps": attacks.aplicar_ataque("compress_decompress", output_format="mp3", quality=64)[1],
+    "filtrado_3000Hz": attacks.aplicar_ataque("low_pass_filter", cutoff=3000)[1]
   }
   plot_attack_spectrograms(attacks.original_audio, attacked_audios, attacks.sr)
   
@@ -142,8 +194,14 @@ def ejecutar_ataques(ruta_audio_modificado, inicio_segmento, fin_segmento, mensa
 def main():
   # Parsear argumentos de línea de comandos
   parser = argparse.ArgumentParser(description='Esteganografía en audio con evaluación de robustez.')
-  parser.add_argument('--attacks', action='store_true', help='Ejecutar módulo de ataques para evaluar la robustez')
+  parser.add_argument('--attacks', type=int, nargs='?', const=1, default=None, metavar='N',
+                      help='Ejecutar módulo de ataques para evaluar la robustez, con N procesos en paralelo (por defecto 1)')
+  parser.add_argument('--guardar-ataques', action='store_true', help='Guardar los audios atacados en attacks_output')
+  parser.add_argument('--cache-ataques', action='store_true', help='Reutilizar los audios atacados de ejecuciones anteriores (caché en disco en .cache_ataques, hasta 1 GB)')
   parser.add_argument('--sequential', action='store_true', help='Usar esteganografía secuencial (por defecto usa aleatoria)')
+  parser.add_argument('--lsb', type=int, default=1, choices=[1, 2, 3, 4], help='Bits del mensaje por muestra (bits menos significativos usados)')
+  parser.add_argument('--transformada', action='store_true', help=f'Insertar el mensaje en el dominio de la frecuencia (QIM sobre la rfft) en todo el audio; capacidad: un bit por cada {TAMANO_TRAMA_TRANSFORMADA} muestras, cabecera de {BITS_CABECERA_TRAMA} bits incluida')
+  parser.add_argument('--ecc', choices=MODOS_ECC, default=None, help='Código corrector de errores aplicado al mensaje encriptado')
   args = parser.parse_args()
   
   # Variables para medir rendimiento
@@ -177,9 +235,8 @@ def main():
   timestamps.append(time.time() - global_start_time)
 
   # Obtener parámetros del archivo de audio original
-  with wave.open(ruta_audio, 'rb') as wav_file:
-    params = wav_file.getparams()
-    sample_rate = wav_file.getframerate()
+  params = obtener_parametros_wav(ruta_audio)
+  sample_rate = params.framerate
 
   # Mensaje a insertar
   mensaje = """
@@ -219,14 +276,38 @@ def main():
   memory_values.append(recursos["memory_mb"])
   timestamps.append(time.time() - global_start_time)
 
+  # Proteger el mensaje encriptado con un código corrector de errores
+  if args.ecc:
+    with TimerContextManager("Código corrector de errores") as timer:
+      # Capacidad real del segmento donde se insertará el mensaje, descontando la cabecera de la trama
+      inicio_segmento, fin_segmento = limites_segmento(arreglo_audio_original, args.transformada)
+      capacidad = capacidad_segmento(fin_segmento - inicio_segmento, args.lsb, args.transformada)
+      reporte_ecc(len(mensaje_bits), max(0, capacidad - BITS_CABECERA_TRAMA))
+      mensaje_bits = codificar_ecc(mensaje_bits, args.ecc)
+    section_names.append("Código corrector de errores")
+    execution_times.append(timer.elapsed)
+
   # Determinar el método de esteganografía
   sequential = args.sequential
-  metodo = "secuencial" if sequential else "aleatorio"
+  metodo = "transformada (rfft)" if args.transformada else "secuencial" if sequential else "aleatorio"
   print(f"\nUtilizando método de esteganografía: {metodo}")
 
-  # Insertar mensaje en el audio con medición de tiempo
+  # En el dominio de la frecuencia cada bit ocupa una trama completa, por lo que se usa todo el audio (profundidad 0 en la cabecera)
+  trama_bits = empaquetar_trama(mensaje_bits, 0 if args.transformada else args.lsb)
+
+  # Comprobar la capacidad antes de insertar para informar de los bits necesarios frente a los disponibles
+  inicio_segmento, fin_segmento = limites_segmento(arreglo_audio_original, args.transformada)
+  capacidad = capacidad_segmento(fin_segmento - inicio_segmento, args.lsb, args.transformada)
+  if len(trama_bits) > capacidad:
+    print(f"Error: la trama necesita {len(trama_bits)} bits y el segmento solo admite {capacidad}")
+    if args.transformada:
+      print(f"Con --transformada se inserta un bit por cada {TAMANO_TRAMA_TRANSFORMADA} muestras: "
+            f"se necesitan al menos {len(trama_bits) * TAMANO_TRAMA_TRANSFORMADA} muestras y el audio tiene {len(arreglo_audio_original)}")
+    sys.exit(1)
+
+  # Insertar el mensaje (con su cabecera de trama) en el audio con medición de tiempo
   with TimerContextManager("Esteganografía") as timer:
-    arreglo_audio_modificado, inicio_segmento, fin_segmento = insertar_mensaje_en_audio(arreglo_audio_original, mensaje_bits, False, sequential)
+    arreglo_audio_modificado, inicio_segmento, fin_segmento = insertar_mensaje_en_audio(arreglo_audio_original, trama_bits, args.transformada, sequential, args.lsb, args.transformada)
   section_names.append("Esteganografía")
   execution_times.append(timer.elapsed)
   
@@ -251,7 +332,7 @@ def main():
 
   # Extraer y verificar el mensaje con medición de tiempo
   with TimerContextManager("Extracción mensaje") as timer:
-    mensaje_desencriptado = extraer_y_verificar_mensaje(arreglo_audio_modificado, inicio_segmento, fin_segmento, mensaje_bits, llave, sequential)
+    mensaje_desencriptado = extraer_y_verificar_mensaje(arreglo_audio_modificado, inicio_segmento, fin_segmento, llave, sequential, args.lsb, args.ecc, args.transformada)
   section_names.append("Extracción mensaje")
   execution_times.append(timer.elapsed)
   
@@ -310,7 +391,7 @@ def main():
   # Ejecutar ataques si se solicita
   if args.attacks:
     with TimerContextManager("Módulo de ataques") as timer:
-      resultados_ataques = ejecutar_ataques(ruta_audio_modificado, inicio_segmento, fin_segmento, len(mensaje_bits), sequential)
+      resultados_ataques = ejecutar_ataques(ruta_audio_modificado, inicio_segmento, fin_segmento, trama_bits, sequential, args.lsb, args.transformada, args.attacks, args.guardar_ataques, args.cache_ataques)
     section_names.append("Módulo de ataques")
     execution_times.append(timer.elapsed)
 
@@ -1,15 +1,71 @@
 import numpy as np
-import scipy.io.wavfile as wav
 import librosa
 import librosa.display
-import soundfile as sf
 import os
 import time
-from pydub import AudioSegment
+import inspect
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from scipy.signal import butter, lfilter, resample
 from scipy import ndimage
-from src.utils.metricas import mse_psnr, distorsion, invisibilidad, entropia, TimerContextManager
+from src.utils.metricas import mse_psnr, distorsion, invisibilidad, entropia, TimerContextManager, MotorBER
 from src.esteganografiado.desesteganografiar import extraer_mensaje_segmento_lsb_sequential, extraer_mensaje_segmento_lsb_random
+from src.esteganografiado.transformada import extraer_mensaje_segmento_transformada, TAMANO_TRAMA_TRANSFORMADA
+from src.utils.utils import CargaBits
+from src.esteganografiado.esteganografiar import cargar_archivo_wav, obtener_parametros_wav, guardar_archivo_wav, ParametrosWav
+from src.utils.cache_ataques import huella_audio
+
+# Versión del código de los ataques: forma parte de la clave de la caché, incrementarla al cambiar un ataque
+# para que no se sirvan resultados calculados con la versión anterior
+VERSION_ATAQUES = 2
+
+# Nombre del archivo de cada ataque en output_dir (se completa con los parámetros del ataque)
+ARCHIVOS_ATAQUES = {
+    "add_noise": "noisy_audio_{noise_level}.wav",
+    "compress_decompress": "decompressed_audio_{output_format}_{quality}.wav",
+    "low_pass_filter": "filtered_audio_{cutoff}Hz.wav",
+    "resampling": "resampled_audio_x{downsample_factor}.wav",
+    "time_stretching": "stretched_audio_x{stretch_factor}.wav",
+    "amplitude_scaling": "scaled_audio_x{scale_factor}.wav",
+    "echo_addition": "echoed_audio_{delay}s_{decay}.wav",
+    "bit_reduction": "bitreduced_audio_{bits}bits.wav",
+}
+
+# Semilla del ruido de la batería de ataques (resultados reproducibles y reutilizables desde la caché)
+SEMILLA_RUIDO = 0
+
+# Batería de ataques en orden: (clave del resultado, método de AudioAttacks, parámetros)
+ATAQUES = (
+    [(f"ruido_{nivel}", "add_noise", {"noise_level": nivel, "seed": SEMILLA_RUIDO}) for nivel in [0.001, 0.005, 0.01, 0.05]]
+    + [(f"compresion_{formato}_{calidad}", "compress_decompress", {"output_format": formato, "quality": calidad})
+       for formato, calidad in [("mp3", 128), ("mp3", 64), ("ogg", 64)]]
+    + [(f"filtrado_{cutoff}", "low_pass_filter", {"cutoff": cutoff}) for cutoff in [8000, 5000, 3000]]
+    + [(f"remuestreo_{factor}", "resampling", {"downsample_factor": factor}) for factor in [2, 4]]
+    + [(f"estiramiento_{factor}", "time_stretching", {"stretch_factor": factor}) for factor in [1.05, 1.1]]
+    + [(f"escalado_{factor}", "amplitude_scaling", {"scale_factor": factor}) for factor in [0.8, 1.2]]
+    + [("eco_0.3_0.6", "echo_addition", {"delay": 0.3, "decay": 0.6})]
+    + [(f"reduccion_bits_{bits}", "bit_reduction", {"bits": bits}) for bits in [12, 8]]
+)
+
+# Códec de ffmpeg de cada formato del ataque de compresión (los demás formatos usan el códec por defecto)
+CODECS_FFMPEG = {"mp3": "libmp3lame", "ogg": "libvorbis"}
+
+# Instancia de AudioAttacks de cada proceso trabajador (sobre la memoria compartida) y su bloque de memoria
+_ataques_trabajador = None
+_memoria_trabajador = None
+
+def _iniciar_trabajador(nombre, forma, tipo, input_file, output_dir, sr, guardar, cache, ancho_muestra):
+    """Inicializar un proceso trabajador: adjuntarse al audio en memoria compartida (sin copia ni lectura del archivo)"""
+    global _ataques_trabajador, _memoria_trabajador
+    _memoria_trabajador = shared_memory.SharedMemory(name=nombre)
+    audio = np.ndarray(forma, dtype=tipo, buffer=_memoria_trabajador.buf)
+    _ataques_trabajador = AudioAttacks(input_file, output_dir, audio=audio, sr=sr, guardar=guardar, cache=cache, ancho_muestra=ancho_muestra)
+
+def _ejecutar_ataque(metodo, parametros, argumentos_evaluacion):
+    """Aplicar un ataque y evaluar la recuperación del mensaje en un proceso trabajador"""
+    _, audio_atacado = _ataques_trabajador.aplicar_ataque(metodo, **parametros)
+    return _ataques_trabajador.evaluate_message_recovery(audio_atacado, *argumentos_evaluacion)
 
 class AudioAttacks:
     """Clase para realizar ataques a audio esteganografiado y evaluar su robustez
@@ -19,47 +75,156 @@ class AudioAttacks:
     recuperado después del ataque.
     """
     
-    def __init__(self, input_file, output_dir="attacks_output"):
+    def __init__(self, input_file, output_dir="attacks_output", audio=None, sr=None, guardar=False, cache=None, ancho_muestra=None):
         """Inicializar la clase de ataques de audio
         
+        Los ataques operan sobre arreglos en memoria; solo si guardar es True se escribe cada audio atacado en output_dir.
+        
         Args:
             input_file (str): Ruta al archivo de audio esteganografiado
-            output_dir (str): Directorio donde se guardarán los archivos de audio atacados
+            output_dir (str): Directorio donde se guardarán los archivos de audio atacados (si guardar es True)
+            audio (numpy.array, optional): Audio ya decodificado (por ejemplo una vista de memoria compartida); los ataques
+                no lo modifican, por lo que se usa sin copiar. Por defecto se lee de input_file.
+            sr (int, optional): Frecuencia de muestreo de audio (requerida si se pasa audio)
+            guardar (bool, optional): Guardar los audios atacados en output_dir. Por defecto no se escribe ningún archivo.
+            cache (CacheAtaques, optional): Caché en disco de los audios atacados usada por aplicar_ataque. Por defecto sin caché.
+            ancho_muestra (int, optional): Bytes por muestra del WAV (1, 2, 3 o 4; requerido para PCM de 24 bits si se pasa audio,
+                que llega como int32). Por defecto el del archivo, o el tamaño del tipo de audio.
         """
         self.input_file = input_file
         self.output_dir = output_dir
-        self.sr, self.audio = wav.read(input_file)
-        self.original_audio = np.copy(self.audio)
-        
-        # Crear directorio de salida si no existe
-        if not os.path.exists(output_dir):
+        self.guardar = guardar
+        self.cache = cache
+        self._huella = None
+        # Se activa cuando un ataque falla y retorna un audio de reemplazo (que no debe guardarse en la caché)
+        self._ataque_fallido = False
+        # Motores BER por parámetros de extracción: la referencia se extrae del audio sin atacar una sola vez
+        self._motores_ber = {}
+        if audio is not None:
+            self.sr = sr
+            self.audio = audio
+            self.original_audio = audio
+            self.ancho_muestra = ancho_muestra or audio.dtype.itemsize
+        else:
+            # Mismo decodificador que la inserción (PCM de 8/16/24/32 bits y flotante): muestras (frames, canales) si es estéreo
+            params = obtener_parametros_wav(input_file)
+            self.sr = params.framerate
+            self.ancho_muestra = params.sampwidth
+            self.audio = cargar_archivo_wav(input_file)
+            if params.nchannels > 1:
+                self.audio = self.audio.reshape(-1, params.nchannels)
+            self.original_audio = np.copy(self.audio)
+        
+        # Rango de las muestras del formato: los ataques trabajan en flotante centrado en 0 (en unidades de muestra)
+        # y vuelven al tipo original recortando a [minimo, maximo]
+        if np.issubdtype(self.audio.dtype, np.floating):
+            self.minimo, self.maximo, self.centro, self.escala = -1.0, 1.0, 0.0, 1.0
+        elif np.issubdtype(self.audio.dtype, np.unsignedinteger):
+            # PCM de 8 bits sin signo, centrado en 128
+            self.escala = float(1 << (8 * self.ancho_muestra - 1))
+            self.minimo, self.maximo, self.centro = 0.0, 2 * self.escala - 1, self.escala
+        else:
+            self.escala = float(1 << (8 * self.ancho_muestra - 1))
+            self.minimo, self.maximo, self.centro = -self.escala, self.escala - 1, 0.0
+        
+        # Crear directorio de salida si no existe (solo si se guardan los audios atacados)
+        if guardar and not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
-    def add_noise(self, noise_level=0.005):
+    def _guardar(self, nombre_archivo, audio):
+        """Guardar un audio atacado en output_dir si está activado el guardado
+        
+        Args:
+            nombre_archivo (str): Nombre del archivo WAV
+            audio (numpy.array): Audio atacado
+        
+        Returns:
+            str | None: Ruta del archivo guardado, o None si no se guardan los audios atacados
+        """
+        if not self.guardar:
+            return None
+        output_file = os.path.join(self.output_dir, nombre_archivo)
+        # Mismo formato que el audio de entrada (incluido PCM de 24 bits)
+        canales = 1 if audio.ndim == 1 else audio.shape[1]
+        flotante = np.issubdtype(self.audio.dtype, np.floating)
+        params = ParametrosWav(canales, self.ancho_muestra, self.sr, len(audio),
+                               'FLOAT' if flotante else 'NONE', 'IEEE float' if flotante else 'not compressed')
+        guardar_archivo_wav(output_file, audio, params)
+        return output_file
+    
+    def aplicar_ataque(self, metodo, **parametros):
+        """Aplicar un ataque por nombre, reutilizando el resultado de la caché si el mismo ataque ya se aplicó
+        sobre las mismas muestras, a la misma frecuencia de muestreo, con los mismos parámetros (y semilla) y la misma
+        VERSION_ATAQUES. No se guardan los ataques aleatorios sin semilla ni los ataques que fallaron.
+        
+        Args:
+            metodo (str): Nombre del método de ataque (por ejemplo "compress_decompress")
+            **parametros: Parámetros del ataque
+        
+        Returns:
+            tuple: (ruta del archivo del audio atacado o None, audio atacado)
+        """
+        if self.cache is None or (metodo == "add_noise" and parametros.get("seed") is None):
+            return getattr(self, metodo)(**parametros)
+        if self._huella is None:
+            # El ancho de muestra distingue PCM de 24 y 32 bits (ambos llegan como int32) y cambia el rango de recorte
+            self._huella = f"{huella_audio(self.audio)}:{self.ancho_muestra}"
+        clave = self.cache.clave(self._huella, metodo, parametros, parametros.get("seed"), self.sr, VERSION_ATAQUES)
+        audio_atacado = self.cache.obtener(clave)
+        if audio_atacado is not None:
+            print(f"\n=== Ataque {metodo} {parametros} recuperado de la caché ===")
+            # Completar los parámetros por defecto para nombrar el archivo como lo hace el propio ataque
+            argumentos = inspect.signature(getattr(self, metodo)).bind(**parametros)
+            argumentos.apply_defaults()
+            return self._guardar(ARCHIVOS_ATAQUES[metodo].format(**argumentos.arguments), audio_atacado), audio_atacado
+        self._ataque_fallido = False
+        ruta, audio_atacado = getattr(self, metodo)(**parametros)
+        if not self._ataque_fallido:
+            self.cache.guardar(clave, audio_atacado)
+        return ruta, audio_atacado
+    
+    def _ajustar_longitud(self, audio):
+        """Recortar o rellenar con ceros (a lo largo del tiempo) un audio atacado para que tenga la longitud del original"""
+        if len(audio) > len(self.original_audio):
+            return audio[:len(self.original_audio)]
+        if len(audio) < len(self.original_audio):
+            relleno = [(0, len(self.original_audio) - len(audio))] + [(0, 0)] * (audio.ndim - 1)
+            return np.pad(audio, relleno, 'constant', constant_values=audio.dtype.type(self.centro))
+        return audio
+    
+    def _a_flotante(self, audio):
+        """Convertir un audio del formato original a flotante (float64) centrado en 0, en unidades de muestra"""
+        return np.asarray(audio, dtype=np.float64) - self.centro
+    
+    def _a_tipo_original(self, audio):
+        """Volver de flotante centrado al tipo de muestra original, recortando al rango del formato"""
+        return np.clip(audio + self.centro, self.minimo, self.maximo).astype(self.audio.dtype)
+    
+    def add_noise(self, noise_level=0.005, seed=None):
         """Aplicar ataque de ruido gaussiano
         
         Args:
             noise_level (float): Nivel de ruido a añadir (como proporción de la amplitud máxima)
+            seed (int, optional): Semilla del generador de ruido (None para ruido no reproducible)
         
         Returns:
-            str: Ruta del archivo de audio con ruido
+            tuple: (ruta del archivo de audio con ruido, o None si no se guarda; audio atacado)
         """
         print("\n=== Aplicando ataque de ruido gaussiano ===")
         with TimerContextManager("Ataque de ruido") as timer:
             # Convertir audio a float para evitar desbordamiento
-            audio_float = self.audio.astype(np.float32)
+            audio_float = self._a_flotante(self.audio)
             max_amplitude = np.max(np.abs(audio_float))
             
             # Generar ruido gaussiano
-            noise = np.random.normal(0, noise_level * max_amplitude, self.audio.shape)
+            noise = np.random.default_rng(seed).normal(0, noise_level * max_amplitude, self.audio.shape)
             noisy_audio = audio_float + noise
             
-            # Volver a convertir a int16 con clipping
-            noisy_audio = np.clip(noisy_audio, -32768, 32767).astype(np.int16)
+            # Volver al tipo original con clipping
+            noisy_audio = self._a_tipo_original(noisy_audio)
             
             # Guardar el audio con ruido
-            output_file = os.path.join(self.output_dir, f"noisy_audio_{noise_level}.wav")
-            wav.write(output_file, self.sr, noisy_audio)
+            output_file = self._guardar(ARCHIVOS_ATAQUES["add_noise"].format(noise_level=noise_level), noisy_audio)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, noisy_audio)
@@ -82,30 +247,29 @@ class AudioAttacks:
             quality (int): Calidad de compresión en kbps
         
         Returns:
-            str: Ruta del archivo de audio comprimido/descomprimido
+            tuple: (ruta del archivo de audio comprimido/descomprimido, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de compresión {output_format.upper()} ({quality}kbps) ===")
         with TimerContextManager(f"Ataque de compresión {output_format}") as timer:
-            compressed_file = os.path.join(self.output_dir, f"compressed_audio.{output_format}")
-            decompressed_file = os.path.join(self.output_dir, f"decompressed_audio_{output_format}_{quality}.wav")
-            
-            # Comprimir el audio
-            audio = AudioSegment.from_wav(self.input_file)
-            audio.export(compressed_file, format=output_format, bitrate=f"{quality}k")
-            
-            # Descomprimir el audio
-            decompressed_audio = AudioSegment.from_file(compressed_file, format=output_format)
-            decompressed_audio.export(decompressed_file, format="wav")
-            
-            # Cargar el audio descomprimido para análisis
-            _, attacked_audio = wav.read(decompressed_file)
-            
-            # Si los tamaños difieren, recortar o expandir para hacer la comparación
-            if len(attacked_audio) > len(self.original_audio):
-                attacked_audio = attacked_audio[:len(self.original_audio)]
-            elif len(attacked_audio) < len(self.original_audio):
-                pad_width = len(self.original_audio) - len(attacked_audio)
-                attacked_audio = np.pad(attacked_audio, (0, pad_width), 'constant')
+            # Codificar y decodificar con ffmpeg a través de tuberías (sin archivos temporales)
+            canales = 1 if self.audio.ndim == 1 else self.audio.shape[1]
+            # PCM flotante normalizado a [-1, 1] para no perder resolución en formatos de más de 16 bits
+            pcm = (self._a_flotante(self.audio) / self.escala).astype('<f4').tobytes()
+            entrada_pcm = ["-f", "f32le", "-ar", str(self.sr), "-ac", str(canales)]
+            codec = ["-c:a", CODECS_FFMPEG[output_format]] if output_format in CODECS_FFMPEG else []
+            comprimido = subprocess.run(
+                ["ffmpeg", "-v", "error", *entrada_pcm, "-i", "pipe:0", *codec, "-b:a", f"{quality}k", "-f", output_format, "pipe:1"],
+                input=pcm, capture_output=True, check=True).stdout
+            decodificado = subprocess.run(
+                ["ffmpeg", "-v", "error", "-i", "pipe:0", *entrada_pcm, "pipe:1"],
+                input=comprimido, capture_output=True, check=True).stdout
+            attacked_audio = self._a_tipo_original(np.frombuffer(decodificado, dtype='<f4') * self.escala)
+            if canales > 1:
+                attacked_audio = attacked_audio[:len(attacked_audio) // canales * canales].reshape(-1, canales)
+            
+            # Si los tamaños difieren (relleno del códec), recortar o expandir para hacer la comparación
+            attacked_audio = self._ajustar_longitud(attacked_audio)
+            decompressed_file = self._guardar(ARCHIVOS_ATAQUES["compress_decompress"].format(output_format=output_format, quality=quality), attacked_audio)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, attacked_audio)
@@ -126,21 +290,21 @@ class AudioAttacks:
             order (int): Orden del filtro
         
         Returns:
-            str: Ruta del archivo de audio filtrado
+            tuple: (ruta del archivo de audio filtrado, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de filtro paso bajo ({cutoff}Hz) ===")
         with TimerContextManager("Ataque de filtrado") as timer:
             nyquist = 0.5 * self.sr
             normal_cutoff = cutoff / nyquist
             b, a = butter(order, normal_cutoff, btype='low', analog=False)
-            filtered_audio = lfilter(b, a, self.audio)
+            # Filtrar a lo largo del tiempo (eje 0), cada canal por separado
+            filtered_audio = lfilter(b, a, self._a_flotante(self.audio), axis=0)
             
-            # Convertir a int16 con clipping
-            filtered_audio = np.clip(filtered_audio, -32768, 32767).astype(np.int16)
+            # Volver al tipo original con clipping
+            filtered_audio = self._a_tipo_original(filtered_audio)
             
             # Guardar el audio filtrado
-            output_file = os.path.join(self.output_dir, f"filtered_audio_{cutoff}Hz.wav")
-            wav.write(output_file, self.sr, filtered_audio)
+            output_file = self._guardar(ARCHIVOS_ATAQUES["low_pass_filter"].format(cutoff=cutoff), filtered_audio)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, filtered_audio)
@@ -162,12 +326,12 @@ class AudioAttacks:
             downsample_factor (int): Factor de submuestreo
         
         Returns:
-            str: Ruta del archivo de audio remuestreado
+            tuple: (ruta del archivo de audio remuestreado, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de remuestreo (factor {downsample_factor}) ===")
         with TimerContextManager("Ataque de remuestreo") as timer:
             # Convertir a float para el procesamiento
-            audio_float = self.audio.astype(np.float32)
+            audio_float = self._a_flotante(self.audio)
             
             # Reducir la frecuencia de muestreo
             num_samples = len(audio_float)
@@ -176,12 +340,11 @@ class AudioAttacks:
             # Restaurar la frecuencia de muestreo original
             resampled = resample(downsampled, num_samples)
             
-            # Convertir a int16 con clipping
-            resampled = np.clip(resampled, -32768, 32767).astype(np.int16)
+            # Volver al tipo original con clipping
+            resampled = self._a_tipo_original(resampled)
             
             # Guardar el audio remuestreado
-            output_file = os.path.join(self.output_dir, f"resampled_audio_x{downsample_factor}.wav")
-            wav.write(output_file, self.sr, resampled)
+            output_file = self._guardar(ARCHIVOS_ATAQUES["resampling"].format(downsample_factor=downsample_factor), resampled)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, resampled)
@@ -201,13 +364,13 @@ class AudioAttacks:
             stretch_factor (float): Factor de estiramiento (>1 para alargar, <1 para acortar)
         
         Returns:
-            str: Ruta del archivo de audio estirado
+            tuple: (ruta del archivo de audio estirado, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de estiramiento temporal (factor {stretch_factor}) ===")
         with TimerContextManager("Ataque de estiramiento") as timer:
             try:
-                # Cargar el audio con librosa para manipulación avanzada
-                y, sr = librosa.load(self.input_file, sr=None, mono=False)
+                # Audio en memoria normalizado a [-1, 1] (formato de librosa: canal primero)
+                y = (self._a_flotante(self.audio.T if self.audio.ndim > 1 else self.audio) / self.escala).astype(np.float32)
                 
                 # Determinar si el audio es mono o estéreo
                 if len(y.shape) > 1:  # Estéreo (librosa usa formato de canal primero)
@@ -249,28 +412,27 @@ class AudioAttacks:
                         pad_width = target_length - current_length
                         stretched = np.pad(stretched, (0, pad_width), 'constant')
                 
-                # Guardar el audio estirado
-                output_file = os.path.join(self.output_dir, f"stretched_audio_x{stretch_factor}.wav")
-                sf.write(output_file, stretched.T if len(stretched.shape) > 1 else stretched, sr)
-                
-                # Convertir a int16 para comparar con original
+                # Volver al tipo original para comparar con el original
                 if len(stretched.shape) > 1:  # Estéreo
                     # Librosa usa formato de canal primero, wav usa canal último
-                    stretched_int16 = np.clip(stretched.T * 32767, -32768, 32767).astype(np.int16)
+                    stretched_audio = self._a_tipo_original(stretched.T * self.escala)
                 else:  # Mono
-                    stretched_int16 = np.clip(stretched * 32767, -32768, 32767).astype(np.int16)
+                    stretched_audio = self._a_tipo_original(stretched * self.escala)
                 
                 # Asegurarse de que la forma coincida con el original
-                if len(self.original_audio.shape) > 1 and len(stretched_int16.shape) == 1:
+                if len(self.original_audio.shape) > 1 and len(stretched_audio.shape) == 1:
                     # Si original es estéreo pero processed es mono, duplicar el canal
-                    stretched_int16 = np.column_stack((stretched_int16, stretched_int16))
-                elif len(self.original_audio.shape) == 1 and len(stretched_int16.shape) > 1:
+                    stretched_audio = np.column_stack((stretched_audio, stretched_audio))
+                elif len(self.original_audio.shape) == 1 and len(stretched_audio.shape) > 1:
                     # Si original es mono pero processed es estéreo, usar solo un canal
-                    stretched_int16 = stretched_int16[:, 0]
+                    stretched_audio = stretched_audio[:, 0]
+                
+                # Guardar el audio estirado
+                output_file = self._guardar(ARCHIVOS_ATAQUES["time_stretching"].format(stretch_factor=stretch_factor), stretched_audio)
                 
                 # Calcular métricas
-                mse, psnr = mse_psnr(self.original_audio, stretched_int16)
-                dist = distorsion(self.original_audio, stretched_int16)
+                mse, psnr = mse_psnr(self.original_audio, stretched_audio)
+                dist = distorsion(self.original_audio, stretched_audio)
                 
                 print(f"Tiempo de ataque: {timer.elapsed:.4f} segundos")
                 print(f"Factor de estiramiento: {stretch_factor}")
@@ -279,9 +441,10 @@ class AudioAttacks:
                 
             except Exception as e:
                 print(f"Error en time_stretching: {e}")
+                self._ataque_fallido = True
                 return None, np.copy(self.original_audio)
                 
-        return output_file, stretched_int16
+        return output_file, stretched_audio
     
     def amplitude_scaling(self, scale_factor=0.8):
         """Aplicar ataque de escalado de amplitud
@@ -290,22 +453,21 @@ class AudioAttacks:
             scale_factor (float): Factor de escalado de amplitud
         
         Returns:
-            str: Ruta del archivo de audio escalado
+            tuple: (ruta del archivo de audio escalado, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de escalado de amplitud (factor {scale_factor}) ===")
         with TimerContextManager("Ataque de escalado") as timer:
             # Convertir a float para el procesamiento
-            audio_float = self.audio.astype(np.float32)
+            audio_float = self._a_flotante(self.audio)
             
             # Escalar la amplitud
             scaled_audio = audio_float * scale_factor
             
-            # Convertir de nuevo a int16 con clipping
-            scaled_audio = np.clip(scaled_audio, -32768, 32767).astype(np.int16)
+            # Volver al tipo original con clipping
+            scaled_audio = self._a_tipo_original(scaled_audio)
             
             # Guardar el audio escalado
-            output_file = os.path.join(self.output_dir, f"scaled_audio_x{scale_factor}.wav")
-            wav.write(output_file, self.sr, scaled_audio)
+            output_file = self._guardar(ARCHIVOS_ATAQUES["amplitude_scaling"].format(scale_factor=scale_factor), scaled_audio)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, scaled_audio)
@@ -326,12 +488,12 @@ class AudioAttacks:
             decay (float): Factor de decaimiento del eco (0-1)
         
         Returns:
-            str: Ruta del archivo de audio con eco
+            tuple: (ruta del archivo de audio con eco, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de adición de eco (delay={delay}s, decay={decay}) ===")
         with TimerContextManager("Ataque de eco") as timer:
             # Convertir a float para el procesamiento
-            audio_float = self.audio.astype(np.float32)
+            audio_float = self._a_flotante(self.audio)
             
             # Crear eco
             delay_samples = int(delay * self.sr)
@@ -343,15 +505,15 @@ class AudioAttacks:
             
             # Normalizar para evitar clipping
             max_val = np.max(np.abs(echoed_audio))
-            if max_val > 32767:
-                echoed_audio = echoed_audio * (32767 / max_val)
+            limite = self.maximo - self.centro
+            if max_val > limite:
+                echoed_audio = echoed_audio * (limite / max_val)
             
-            # Convertir a int16
-            echoed_audio = np.clip(echoed_audio, -32768, 32767).astype(np.int16)
+            # Volver al tipo original
+            echoed_audio = self._a_tipo_original(echoed_audio)
             
             # Guardar el audio con eco
-            output_file = os.path.join(self.output_dir, f"echoed_audio_{delay}s_{decay}.wav")
-            wav.write(output_file, self.sr, echoed_audio)
+            output_file = self._guardar(ARCHIVOS_ATAQUES["echo_addition"].format(delay=delay, decay=decay), echoed_audio)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, echoed_audio)
@@ -368,26 +530,25 @@ class AudioAttacks:
         """Aplicar ataque de reducción de bits
         
         Args:
-            bits (int): Número de bits a utilizar (menos que 16)
+            bits (int): Número de bits a utilizar (menos que los del formato)
         
         Returns:
-            str: Ruta del archivo de audio con reducción de bits
+            tuple: (ruta del archivo de audio con reducción de bits, o None si no se guarda; audio atacado)
         """
         print(f"\n=== Aplicando ataque de reducción de bits ({bits} bits) ===")
         with TimerContextManager("Ataque de reducción de bits") as timer:
             # Convertir a float para el procesamiento
-            audio_float = self.audio.astype(np.float32) / 32768.0
+            audio_float = self._a_flotante(self.audio) / self.escala
             
             # Reducir la profundidad de bits
             quant_factor = 2.0 ** bits
             reduced_audio = np.floor(audio_float * quant_factor) / quant_factor
             
-            # Convertir de nuevo a int16
-            reduced_audio = (reduced_audio * 32768).astype(np.int16)
+            # Volver al tipo original
+            reduced_audio = self._a_tipo_original(reduced_audio * self.escala)
             
             # Guardar el audio con reducción de bits
-            output_file = os.path.join(self.output_dir, f"bitreduced_audio_{bits}bits.wav")
-            wav.write(output_file, self.sr, reduced_audio)
+            output_file = self._guardar(ARCHIVOS_ATAQUES["bit_reduction"].format(bits=bits), reduced_audio)
             
             # Calcular métricas
             mse, psnr = mse_psnr(self.original_audio, reduced_audio)
@@ -400,50 +561,76 @@ class AudioAttacks:
             
         return output_file, reduced_audio
 
-    def evaluate_message_recovery(self, attacked_audio, inicio_segmento, fin_segmento, mensaje_bits_length, sequential=False):
+    def _extraer_bits(self, segmento, mensaje_bits_length, sequential, num_least_significant_bits, transformada):
+        """Extraer los bits del mensaje de un segmento con el mismo método con el que fue insertado"""
+        if transformada:
+            bits_extraidos, _ = extraer_mensaje_segmento_transformada(segmento, mensaje_bits_length)
+        elif sequential:
+            bits_extraidos, _ = extraer_mensaje_segmento_lsb_sequential(segmento, mensaje_bits_length, num_least_significant_bits)
+        else:
+            bits_extraidos, _ = extraer_mensaje_segmento_lsb_random(segmento, mensaje_bits_length, num_least_significant_bits)
+        return bits_extraidos
+
+    def _motor_ber(self, inicio_segmento, fin_segmento, mensaje_bits_length, sequential, num_least_significant_bits, transformada):
+        """Obtener el motor BER de unos parámetros de extracción, extrayendo la referencia del audio sin atacar solo la primera vez"""
+        clave = (inicio_segmento, fin_segmento, mensaje_bits_length, sequential, num_least_significant_bits, transformada)
+        if clave not in self._motores_ber:
+            segmento_original = self.original_audio.reshape(-1)[inicio_segmento:fin_segmento]
+            referencia = self._extraer_bits(segmento_original, mensaje_bits_length, sequential, num_least_significant_bits, transformada)
+            self._motores_ber[clave] = MotorBER(referencia)
+        return self._motores_ber[clave]
+    
+    def evaluate_message_recovery(self, attacked_audio, inicio_segmento, fin_segmento, mensaje_bits_length, sequential=False, num_least_significant_bits=1, transformada=False):
         """Evaluar si el mensaje puede ser recuperado después del ataque
         
+        Los bits de referencia se extraen del audio sin atacar una sola vez por instancia (ver MotorBER), así que cada
+        audio atacado solo cuesta su propia extracción y una comparación de los bits empaquetados.
+        
         Args:
-            attacked_audio (numpy.array): Audio atacado
-            inicio_segmento (int): Posición de inicio del segmento con el mensaje
-            fin_segmento (int): Posición final del segmento con el mensaje
-            mensaje_bits_length (int): Longitud del mensaje en bits
+            attacked_audio (numpy.array): Audio atacado (1-D o (frames, canales))
+            inicio_segmento (int): Posición de inicio del segmento con el mensaje (en muestras intercaladas)
+            fin_segmento (int): Posición final del segmento con el mensaje (en muestras intercaladas)
+            mensaje_bits_length (int | CargaBits): Longitud del mensaje en bits, o la carga de bits original
+                (en ese caso se usa como referencia en lugar de extraerla del audio sin atacar)
             sequential (bool): Si el mensaje fue insertado secuencialmente o no
+            num_least_significant_bits (int): Bits del mensaje guardados en cada muestra
+            transformada (bool): Si el mensaje fue insertado en el dominio de la frecuencia (un bit por trama)
         
         Returns:
-            tuple: (éxito de recuperación (bool), número de bits correctos, porcentaje de bits correctos)
+            tuple: (éxito de recuperación (bool), número de bits correctos, porcentaje de bits correctos,
+                reporte de MotorBER.evaluar con la BER, las ráfagas y el mapa de errores, o None si no se pudo extraer)
         """
         try:
             print("\n--- Intentando recuperar mensaje ---")
             
-            # Extraer segmento del audio atacado
-            segmento_extraido = attacked_audio[inicio_segmento:fin_segmento]
+            # Motor BER con la carga original conocida o con la extraída (una sola vez) del audio sin atacar
+            if isinstance(mensaje_bits_length, CargaBits):
+                motor = MotorBER(mensaje_bits_length)
+            else:
+                motor = self._motor_ber(inicio_segmento, fin_segmento, mensaje_bits_length, sequential, num_least_significant_bits, transformada)
+            mensaje_bits_length = motor.n_bits
+            
+            # Extraer segmento del audio atacado: las posiciones son índices de muestras intercaladas (como en la inserción),
+            # por lo que el audio (frames, canales) se recorre aplanado
+            segmento_extraido = np.reshape(attacked_audio, -1)[inicio_segmento:fin_segmento]
             
             # Verificar si hay suficientes muestras
-            if len(segmento_extraido) < mensaje_bits_length:
+            capacidad = len(segmento_extraido) // TAMANO_TRAMA_TRANSFORMADA if transformada else len(segmento_extraido) * num_least_significant_bits
+            if capacidad < mensaje_bits_length:
                 print("Error: El segmento extraído es demasiado corto para contener el mensaje.")
-                return False, 0, 0
+                return False, 0, 0, None
             
-            # Intentar extraer el mensaje
-            if sequential:
-                bits_extraidos, _ = extraer_mensaje_segmento_lsb_sequential(segmento_extraido, mensaje_bits_length)
-            else:
-                bits_extraidos, _ = extraer_mensaje_segmento_lsb_random(segmento_extraido, mensaje_bits_length)
-            
-            # Extraer mensaje del audio original para comparar
-            segmento_original = self.original_audio[inicio_segmento:fin_segmento]
-            if sequential:
-                bits_originales, _ = extraer_mensaje_segmento_lsb_sequential(segmento_original, mensaje_bits_length)
-            else:
-                bits_originales, _ = extraer_mensaje_segmento_lsb_random(segmento_original, mensaje_bits_length)
+            # Intentar extraer el mensaje y compararlo con la referencia
+            bits_extraidos = self._extraer_bits(segmento_extraido, mensaje_bits_length, sequential, num_least_significant_bits, transformada)
+            reporte = motor.evaluar(bits_extraidos)
             
-            # Contar bits correctos
-            bits_correctos = sum(1 for a, b in zip(bits_originales, bits_extraidos) if a == b)
+            bits_correctos = mensaje_bits_length - reporte["errores"]
             porcentaje_correctos = (bits_correctos / mensaje_bits_length) * 100
             
             print(f"Bits totales: {mensaje_bits_length}")
             print(f"Bits correctos: {bits_correctos}")
             print(f"Porcentaje de bits correctos: {porcentaje_correctos:.2f}%")
+            print(f"BER: {reporte['ber']:.6f}, ráfagas de errores: {reporte['rafagas']} (media {reporte['rafaga_media']:.2f}, máxima {reporte['rafaga_maxima']})")
             
             # Criterio de éxito: más del 95% de bits correctos
             exito = porcentaje_correctos > 95
@@ -452,75 +639,70 @@ class AudioAttacks:
             else:
                 print("❌ No se pudo recuperar el mensaje correctamente")
                 
-            return exito, bits_correctos, porcentaje_correctos
+            return exito, bits_correctos, porcentaje_correctos, reporte
             
         except Exception as e:
             print(f"Error al intentar recuperar el mensaje: {e}")
-            return False, 0, 0
+            return False, 0, 0, None
     
-    def run_all_attacks(self, inicio_segmento, fin_segmento, mensaje_bits_length, sequential=False):
+    def run_all_attacks(self, inicio_segmento, fin_segmento, mensaje_bits_length, sequential=False, num_least_significant_bits=1, transformada=False, n_procesos=1):
         """Ejecutar todos los ataques y evaluar la robustez
         
+        Con n_procesos > 1 los ataques (y su evaluación) se reparten en un grupo de procesos: el audio se copia una sola vez
+        a memoria compartida y cada trabajador lo usa sin copiarlo ni volver a leer el archivo. Los resultados se
+        combinan en el orden de ATAQUES, independientemente del orden en que terminen.
+        
         Args:
-            inicio_segmento (int): Posición de inicio del segmento con el mensaje
-            fin_segmento (int): Posición final del segmento con el mensaje
-            mensaje_bits_length (int): Longitud del mensaje en bits
+            inicio_segmento (int): Posición de inicio del segmento con el mensaje (en muestras intercaladas)
+            fin_segmento (int): Posición final del segmento con el mensaje (en muestras intercaladas)
+            mensaje_bits_length (int | CargaBits): Longitud del mensaje en bits o la carga de bits original
             sequential (bool): Si el mensaje fue insertado secuencialmente o no
+            num_least_significant_bits (int): Bits del mensaje guardados en cada muestra
+            transformada (bool): Si el mensaje fue insertado en el dominio de la frecuencia
+            n_procesos (int): Número de procesos trabajadores (1 ejecuta los ataques en el proceso actual)
             
         Returns:
-            dict: Resultados de todos los ataques
+            dict: Resultados de todos los ataques, precedidos de la verificación sin ataque ("sin_ataque")
         """
         resultados = {}
+        argumentos_evaluacion = (inicio_segmento, fin_segmento, mensaje_bits_length, sequential, num_least_significant_bits, transformada)
         
         print("\n==================================================")
         print("INICIANDO BATERÍA DE ATAQUES")
         print("==================================================")
         
-        # Ataque de ruido
-        for nivel in [0.001, 0.005, 0.01, 0.05]:
-            _, audio_atacado = self.add_noise(noise_level=nivel)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"ruido_{nivel}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de compresión
-        for formato, calidad in [("mp3", 128), ("mp3", 64), ("ogg", 64)]:
-            _, audio_atacado = self.compress_decompress(output_format=formato, quality=calidad)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"compresion_{formato}_{calidad}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de filtrado
-        for cutoff in [8000, 5000, 3000]:
-            _, audio_atacado = self.low_pass_filter(cutoff=cutoff)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"filtrado_{cutoff}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de remuestreo
-        for factor in [2, 4]:
-            _, audio_atacado = self.resampling(downsample_factor=factor)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"remuestreo_{factor}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de estiramiento temporal
-        for factor in [1.05, 1.1]:
-            _, audio_atacado = self.time_stretching(stretch_factor=factor)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"estiramiento_{factor}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de escalado de amplitud
-        for factor in [0.8, 1.2]:
-            _, audio_atacado = self.amplitude_scaling(scale_factor=factor)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"escalado_{factor}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de eco
-        _, audio_atacado = self.echo_addition(delay=0.3, decay=0.6)
-        exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-        resultados["eco_0.3_0.6"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        # Ataque de reducción de bits
-        for bits in [12, 8]:
-            _, audio_atacado = self.bit_reduction(bits=bits)
-            exito, bits, porcentaje = self.evaluate_message_recovery(audio_atacado, inicio_segmento, fin_segmento, mensaje_bits_length, sequential)
-            resultados[f"reduccion_bits_{bits}"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
-        
-        return resultados
\ No newline at end of file
+        # Verificación sin ataque: con la carga original como referencia la BER debe ser 0; si no, la extracción
+        # (segmento, canales o método) no corresponde a la inserción y los resultados de los ataques no son válidos
+        print("\n=== Verificación sin ataque ===")
+        exito, bits, porcentaje, reporte = self.evaluate_message_recovery(self.audio, *argumentos_evaluacion)
+        resultados["sin_ataque"] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
+        if reporte is not None:
+            resultados["sin_ataque"].update(reporte)
+        if reporte is None or reporte["errores"]:
+            print("Advertencia: el mensaje no se recupera sin ataque, revise los parámetros de extracción")
+        
+        if n_procesos == 1:
+            evaluaciones = []
+            for _, metodo, parametros in ATAQUES:
+                _, audio_atacado = self.aplicar_ataque(metodo, **parametros)
+                evaluaciones.append(self.evaluate_message_recovery(audio_atacado, *argumentos_evaluacion))
+        else:
+            memoria = shared_memory.SharedMemory(create=True, size=max(1, self.audio.nbytes))
+            try:
+                compartido = np.ndarray(self.audio.shape, dtype=self.audio.dtype, buffer=memoria.buf)
+                compartido[...] = self.audio
+                compartido = None
+                argumentos_trabajador = (memoria.name, self.audio.shape, self.audio.dtype.str, self.input_file, self.output_dir, self.sr, self.guardar, self.cache, self.ancho_muestra)
+                with ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar_trabajador, initargs=argumentos_trabajador) as executor:
+                    futuros = [executor.submit(_ejecutar_ataque, metodo, parametros, argumentos_evaluacion) for _, metodo, parametros in ATAQUES]
+                    evaluaciones = [futuro.result() for futuro in futuros]
+            finally:
+                memoria.close()
+                memoria.unlink()
+        
+        for (nombre, _, _), (exito, bits, porcentaje, reporte) in zip(ATAQUES, evaluaciones):
+            resultados[nombre] = {"exito": exito, "bits_correctos": bits, "porcentaje": porcentaje}
+            if reporte is not None:
+                resultados[nombre].update(reporte)
+        
+        return resultados
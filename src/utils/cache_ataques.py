@@ -0,0 +1,118 @@
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+
+# Directorio y tamaño máximo (bytes) por defecto de la caché de audios atacados
+DIRECTORIO_CACHE_ATAQUES = ".cache_ataques"
+LIMITE_CACHE_ATAQUES = 1024 * 1024 * 1024
+
+def huella_audio(audio):
+    """Calcular la huella (SHA-256) de las muestras de un audio, incluyendo su tipo y forma
+
+    Args:
+        audio (numpy.array): Audio
+
+    Returns:
+        str: Huella hexadecimal
+    """
+    huella = hashlib.sha256(f"{audio.dtype.str}{audio.shape}".encode())
+    huella.update(memoryview(np.ascontiguousarray(audio)).cast('B'))
+    return huella.hexdigest()
+
+class CacheAtaques:
+    """Caché en disco de audios atacados, direccionada por contenido
+
+    Cada entrada es un archivo .npy cuyo nombre es el SHA-256 de (huella del audio de entrada, nombre del ataque,
+    parámetros, semilla, frecuencia de muestreo y versión del ataque). Las escrituras son atómicas (archivo
+    temporal + os.replace), por lo que varios procesos pueden compartir el directorio. El tamaño total se limita desalojando las entradas usadas hace más tiempo (LRU),
+    con la fecha de modificación del archivo como marca de último uso.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE_ATAQUES, limite_bytes=LIMITE_CACHE_ATAQUES):
+        """Inicializar la caché
+
+        Args:
+            directorio (str): Directorio de la caché (se crea si no existe)
+            limite_bytes (int): Tamaño máximo total de las entradas en bytes
+        """
+        self.directorio = directorio
+        self.limite_bytes = limite_bytes
+        os.makedirs(directorio, exist_ok=True)
+
+    def clave(self, huella, ataque, parametros, semilla=None, frecuencia=None, version=None):
+        """Calcular la clave de una entrada
+
+        Args:
+            huella (str): Huella de las muestras de entrada (ver huella_audio)
+            ataque (str): Nombre del ataque
+            parametros (dict): Parámetros del ataque
+            semilla (int, optional): Semilla del generador aleatorio del ataque
+            frecuencia (int, optional): Frecuencia de muestreo del audio de entrada (los filtros y códecs dependen de ella)
+            version (int, optional): Versión del código del ataque (invalida las entradas de versiones anteriores)
+
+        Returns:
+            str: Clave hexadecimal
+        """
+        descripcion = json.dumps([huella, ataque, parametros, semilla, frecuencia, version], sort_keys=True, default=str)
+        return hashlib.sha256(descripcion.encode()).hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.npy")
+
+    def obtener(self, clave):
+        """Obtener un audio atacado de la caché, mapeado en memoria (solo lectura)
+
+        Args:
+            clave (str): Clave de la entrada
+
+        Returns:
+            numpy.array | None: Audio atacado, o None si no está en la caché
+        """
+        ruta = self._ruta(clave)
+        try:
+            audio = np.load(ruta, mmap_mode='r')
+            # Marcar la entrada como usada recientemente
+            os.utime(ruta)
+        except (FileNotFoundError, ValueError):
+            return None
+        return audio
+
+    def guardar(self, clave, audio):
+        """Guardar un audio atacado en la caché de forma atómica y desalojar entradas si se excede el límite
+
+        Args:
+            clave (str): Clave de la entrada
+            audio (numpy.array): Audio atacado
+        """
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                np.save(archivo, np.asarray(audio))
+            os.replace(temporal, self._ruta(clave))
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        self._desalojar()
+
+    def _desalojar(self):
+        """Eliminar las entradas usadas hace más tiempo hasta que el tamaño total no exceda el límite"""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".npy"):
+                try:
+                    estado = os.stat(os.path.join(self.directorio, nombre))
+                except FileNotFoundError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, nombre))
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, nombre in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+            except FileNotFoundError:
+                # Otro proceso ya la eliminó
+                pass
+            total -= tamano
@@ -1,4 +1,11 @@
 import numpy as np
+from collections import OrderedDict
+
+try:
+  # numba es opcional (llega como dependencia de librosa); si no está se usa el camino en Python puro
+  from numba import njit
+except ImportError:
+  njit = None
 
 def mapa_logistico(x=8, r=3.99):
   """Mapa logístico para generar una secuencia de números pseudoaleatorios en el rango [0, 1] utilizando un valor inicial y un parámetro de caos.
@@ -13,43 +20,273 @@ def mapa_logistico(x=8, r=3.99):
   """
   return r * x * (1 - x)
 
-def generar_secuencia_aleatoria(x0, r, n_warmup, lim_inf, lim_sup, tipo='float'):
-  """Generar una secuencia aleatoria en un rango determinado sin repeticiones utilizando el mapa logístico
+def _orbita_logistica(x0, r, n_warmup, n):
+  """Núcleo compilable (numba) de generar_orbita: calentamiento más n iteraciones en una sola llamada.
+  Usa exactamente la misma expresión que mapa_logistico para que los valores sean idénticos bit a bit.
+  """
+  x = x0
+  for _ in range(n_warmup):
+    x = r * x * (1 - x)
+  orbita = np.empty(n, dtype=np.float64)
+  for i in range(n):
+    x = r * x * (1 - x)
+    orbita[i] = x
+  return orbita
+
+def _llave_logistica(x0, r, n_warmup, length, bits_por_iteracion):
+  """Núcleo compilable (numba) de generar_llave: calentamiento más la cuantización de cada
+  iteración directamente a bytes (uint8), con la misma regla que cuantizar_orbita.
+  """
+  x = x0
+  for _ in range(n_warmup):
+    x = r * x * (1 - x)
+  llave = np.empty(length, dtype=np.uint8)
+  mascara = (1 << bits_por_iteracion) - 1
+  for i in range(length):
+    byte = 0
+    for _ in range(8 // bits_por_iteracion):
+      x = r * x * (1 - x)
+      if bits_por_iteracion == 1:
+        valor = 1 if x > 0.5 else 0
+      else:
+        valor = np.uint64(x * 4294967296.0) & mascara
+      byte = (byte << bits_por_iteracion) | valor
+    llave[i] = byte
+  return llave
+
+# Caché LRU de prefijos de órbitas, indexada por (x0, r, n_warmup) y limitada en bytes
+LIMITE_CACHE_ORBITAS = 64 * 1024 * 1024
+_cache_orbitas = OrderedDict()
+
+# Caché LRU de permutaciones caóticas, indexada por (x0, r, n_warmup, n) y limitada en bytes
+LIMITE_CACHE_PERMUTACIONES = 64 * 1024 * 1024
+_cache_permutaciones = OrderedDict()
+
+# Tamaño máximo (bytes) del bloque de valores de la órbita que generar_llaves_lote guarda antes de cuantizarlo
+LIMITE_BLOQUE_LOTE = 1024 * 1024
+
+if njit is not None:
+  _orbita_compilada = njit(cache=True)(_orbita_logistica)
+  _llave_compilada = njit(cache=True)(_llave_logistica)
+else:
+  _orbita_compilada = None
+  _llave_compilada = None
+
+def generar_orbita(x0, r, n_warmup, n):
+  """Generar la órbita del mapa logístico: n valores consecutivos después de calentar el sistema
 
   Args:
     x0 (float): valor inicial del mapa logístico (rango: [0, 1])
     r (float): parámetro de caos del mapa logístico (rango: [3.57, 4])
-    n_warmup (float): Número de iteraciones para calentar el sistema (alcanzar el estado de equilibrio)
-    lim_inf (int): Límite inferior del rango de valores aleatorios
-    lim_sup (int): Límite superior del rango de valores aleatorios
-    tipo (str): Tipo de valores a generar ('float' o 'int'). Defaults to 'float'.
+    n_warmup (int): Número de iteraciones para calentar el sistema (alcanzar el estado de equilibrio)
+    n (int): Número de valores de la órbita a generar
 
   Returns:
-    array: Arreglo de valores aleatorios en el rango [lim_inf, lim_sup] sin repeticiones
+    numpy.array: Arreglo (float64) con los n valores de la órbita
   """
-  secuencia_aleatoria = []
-  valores_generados = set()
+  if _orbita_compilada is not None:
+    return _orbita_compilada(float(x0), float(r), int(n_warmup), int(n))
   x = x0
   # Calentar el sistema
   for _ in range(n_warmup):
     x = mapa_logistico(x, r)
-  # Generar la secuencia aleatoria sin repeticiones
-  #print(lim_sup - lim_inf)
-  while len(secuencia_aleatoria) < (lim_sup - lim_inf):
-    #print(lim_sup - lim_inf)
-    #print(len(secuencia_aleatoria))
-    x = mapa_logistico(x, r)
-    valor = lim_inf + (x * (lim_sup - lim_inf))
-    if tipo == 'int':
-      valor = int(valor)
-    if valor not in valores_generados:
-      valores_generados.add(valor)
-      secuencia_aleatoria.append(valor)
-  #print(secuencia_aleatoria)
 
-  return secuencia_aleatoria
+  def iterar(x):
+    for _ in range(n):
+      x = mapa_logistico(x, r)
+      yield x
+
+  return np.fromiter(iterar(x), dtype=np.float64, count=n)
+
+def prefijo_orbita(x0, r, n_warmup, n):
+  """Obtener los primeros n valores de la órbita (después del calentamiento) desde una caché LRU.
+  Si la órbita ya está en caché con al menos n valores se retorna sin iterar; si está con menos,
+  solo se calculan las iteraciones nuevas a partir del último estado guardado.
+
+  Args:
+    x0 (float): valor inicial del mapa logístico (rango: [0, 1])
+    r (float): parámetro de caos del mapa logístico (rango: [3.57, 4])
+    n_warmup (int): Número de iteraciones para calentar el sistema
+    n (int): Número de valores de la órbita requeridos
+
+  Returns:
+    numpy.array: Arreglo (float64) de solo lectura con los n primeros valores de la órbita
+  """
+  clave = (float(x0), float(r), int(n_warmup))
+  orbita = _cache_orbitas.get(clave)
+  if orbita is not None and len(orbita) >= n:
+    _cache_orbitas.move_to_end(clave)
+    return orbita[:n]
+  if orbita is None:
+    orbita = generar_orbita(x0, r, n_warmup, n)
+  else:
+    # Continuar la órbita desde su último valor (sin calentamiento)
+    orbita = np.concatenate((orbita, generar_orbita(orbita[-1], r, 0, n - len(orbita))))
+  orbita.setflags(write=False)
+  _guardar_en_cache(_cache_orbitas, clave, orbita, LIMITE_CACHE_ORBITAS)
+  return orbita
+
+def _guardar_en_cache(cache, clave, arreglo, limite_bytes):
+  """Guardar un arreglo en una caché LRU (OrderedDict) y descartar las entradas usadas hace más tiempo
+  hasta que el total no exceda limite_bytes. Los arreglos más grandes que el límite no se guardan."""
+  cache.pop(clave, None)
+  if 0 < arreglo.nbytes <= limite_bytes:
+    cache[clave] = arreglo
+    while sum(a.nbytes for a in cache.values()) > limite_bytes:
+      cache.popitem(last=False)
+
+class FlujoCaotico:
+  """Flujo caótico reanudable basado en el mapa logístico.
+
+  Mantiene el estado actual del mapa para entregar la órbita por partes (siguiente), permite
+  guardar y restaurar ese estado (estado/restaurar) y sirve cualquier prefijo del flujo desde
+  la caché compartida (prefijo), de modo que las peticiones repetidas o crecientes solo
+  calculan las iteraciones nuevas.
+
+  Example:
+    flujo = FlujoCaotico(ChaosMod.X0.value, ChaosMod.R.value, ChaosMod.N_WARMUP.value)
+    bloque_1 = flujo.siguiente(1024)
+    instantanea = flujo.estado()
+    bloque_2 = flujo.siguiente(1024)
+    flujo.restaurar(instantanea)  # siguiente(1024) vuelve a entregar bloque_2
+  """
+  def __init__(self, x0, r, n_warmup):
+    self.x0 = x0
+    self.r = r
+    self.n_warmup = n_warmup
+    # Calentar el sistema una sola vez: el estado queda listo para entregar el primer valor
+    self.x = float(generar_orbita(x0, r, n_warmup - 1, 1)[0]) if n_warmup > 0 else x0
+    self.posicion = 0
+
+  def siguiente(self, n):
+    """Entregar los n valores siguientes del flujo y avanzar el estado
+
+    Args:
+        n (int): Número de valores a entregar
+
+    Returns:
+        numpy.array: Arreglo (float64) con los valores siguientes de la órbita
+    """
+    orbita = generar_orbita(self.x, self.r, 0, n)
+    if n > 0:
+      self.x = float(orbita[-1])
+      self.posicion += n
+    return orbita
+
+  def estado(self):
+    """Obtener una instantánea del estado del flujo
+
+    Returns:
+        tuple: (valor actual del mapa, número de valores entregados)
+    """
+    return (self.x, self.posicion)
+
+  def restaurar(self, estado):
+    """Restaurar el flujo a una instantánea obtenida con estado()
+
+    Args:
+        estado (tuple): (valor actual del mapa, número de valores entregados)
+    """
+    self.x, self.posicion = estado
+
+  def prefijo(self, n):
+    """Obtener los n primeros valores del flujo (desde la caché, sin modificar el estado actual)
 
-def generar_llave(x0, r, n_warmup, length):
+    Args:
+        n (int): Número de valores del prefijo
+
+    Returns:
+        numpy.array: Arreglo (float64) de solo lectura con el prefijo de la órbita
+    """
+    return prefijo_orbita(self.x0, self.r, self.n_warmup, n)
+
+def _permutacion_caotica(x0, r, n_warmup, n):
+  """Permutación de [0, n) definida por el orden ascendente de los n primeros valores de la órbita.
+  Se guarda en una caché LRU limitada en bytes (LIMITE_CACHE_PERMUTACIONES) para que las extracciones
+  repetidas sobre el mismo segmento no vuelvan a ordenar; los índices se guardan en int32 si caben.
+  """
+  clave = (x0, r, n_warmup, n)
+  permutacion = _cache_permutaciones.get(clave)
+  if permutacion is not None:
+    _cache_permutaciones.move_to_end(clave)
+    return permutacion
+  permutacion = np.argsort(prefijo_orbita(x0, r, n_warmup, n), kind='stable')
+  if n < 2 ** 31:
+    permutacion = permutacion.astype(np.int32)
+  permutacion.setflags(write=False)
+  _guardar_en_cache(_cache_permutaciones, clave, permutacion, LIMITE_CACHE_PERMUTACIONES)
+  return permutacion
+
+def generar_secuencia_aleatoria(x0, r, n_warmup, lim_inf, lim_sup, tipo='float', cantidad=None):
+  """Generar una secuencia aleatoria en un rango determinado sin repeticiones utilizando el mapa logístico.
+    Para valores enteros la secuencia es una permutación de [lim_inf, lim_sup): se generan
+    lim_sup - lim_inf valores de la órbita y se ordenan (argsort), de modo que el costo es
+    determinista y acotado (una iteración del mapa por elemento) en lugar de repetir hasta
+    encontrar todos los valores distintos.
+
+  Args:
+    x0 (float): valor inicial del mapa logístico (rango: [0, 1])
+    r (float): parámetro de caos del mapa logístico (rango: [3.57, 4])
+    n_warmup (float): Número de iteraciones para calentar el sistema (alcanzar el estado de equilibrio)
+    lim_inf (int): Límite inferior del rango de valores aleatorios
+    lim_sup (int): Límite superior del rango de valores aleatorios
+    tipo (str): Tipo de valores a generar ('float' o 'int'). Defaults to 'float'.
+    cantidad (int, optional): Número de valores a generar (prefijo de la secuencia completa). Defaults to None (todo el rango).
+
+  Returns:
+    numpy.array: Arreglo de valores aleatorios en el rango [lim_inf, lim_sup) sin repeticiones
+  """
+  n = lim_sup - lim_inf
+  if cantidad is None:
+    cantidad = n
+  if tipo == 'int':
+    # Los índices se guardan en int32: sumar en int64 para que lim_inf no desborde
+    return lim_inf + _permutacion_caotica(float(x0), float(r), int(n_warmup), n)[:cantidad].astype(np.int64)
+  # Para valores reales basta con escalar la órbita al rango (no se repiten en la práctica)
+  orbita = prefijo_orbita(x0, r, n_warmup, cantidad)
+  return lim_inf + (orbita * n)
+
+def cuantizar_valores(orbita, bits_por_iteracion=1):
+  """Cuantizar cada valor de la órbita a bits_por_iteracion bits (uint8): umbral x > 0.5 con 1 bit,
+  bits bajos de floor(x * 2^32) con más bits"""
+  if bits_por_iteracion == 1:
+    return (orbita > 0.5).astype(np.uint8)
+  return ((orbita * 2.0 ** 32).astype(np.uint64) & ((1 << bits_por_iteracion) - 1)).astype(np.uint8)
+
+def cuantizar_orbita(orbita, length, bits_por_iteracion=1):
+  """Convertir valores de la órbita del mapa logístico en una llave de bytes
+
+  Con 1 bit por iteración se usa el umbral x > 0.5. Con más bits se toman los
+  bits_por_iteracion bits bajos de floor(x * 2^32), es decir, bits profundos de la
+  mantisa que están mucho menos correlacionados entre iteraciones que el primero.
+
+  Args:
+      orbita (numpy.array): Valores de la órbita (float64); si es 2-D cada fila es un flujo distinto
+      length (int): Longitud de la llave en bytes
+      bits_por_iteracion (int, optional): Bits extraídos de cada iteración (1, 2, 4 u 8). Defaults to 1.
+
+  Returns:
+      numpy.array: Arreglo de bytes (uint8) con la llave (una fila por flujo si la órbita es 2-D)
+
+  Raises:
+      ValueError: Si bits_por_iteracion no es 1, 2, 4 u 8
+  """
+  if bits_por_iteracion not in (1, 2, 4, 8):
+    raise ValueError("bits_por_iteracion debe ser 1, 2, 4 u 8")
+  if bits_por_iteracion == 1:
+    # Convertir el valor del mapa logístico a un bit (0 o 1)
+    bits = cuantizar_valores(orbita, 1)
+  else:
+    valores = cuantizar_valores(orbita, bits_por_iteracion)
+    if bits_por_iteracion == 8:
+      return valores[..., :length]
+    # Expandir cada valor a sus bits_por_iteracion bits (el más significativo primero)
+    bits = np.unpackbits(valores[..., None], axis=-1)[..., 8 - bits_por_iteracion:]
+    bits = bits.reshape(valores.shape[:-1] + (-1,))
+  # packbits: Convierte una matriz de bits en una matriz de bytes (8 bits) (uint8)
+  return np.packbits(bits, axis=-1)[..., :length]
+
+def generar_llave(x0, r, n_warmup, length, bits_por_iteracion=1):
   """Generar una llave aleatoria utilizando el mapa logístico
 
   Args:
@@ -57,25 +294,70 @@ def generar_llave(x0, r, n_warmup, length):
       r (float): parámetro de caos del mapa logístico (rango: [3.57, 4])
       n_warmup (float): Número de iteraciones para calentar el sistema (alcanzar el estado de equilibrio)
       length (int): Longitud de la llave en bytes
+      bits_por_iteracion (int, optional): Bits de llave extraídos de cada iteración del mapa (1, 2, 4 u 8).
+        Con 8 se necesita una iteración por byte en lugar de ocho. Defaults to 1.
 
   Returns:
       array: Arreglo de bytes con la llave aleatoria generada por el mapa logístico.
   """
-  key_bits = []
-  x = x0
-  # Calentar el sistema, descartar los primeros valores para que el sistema alcance el estado de equilibrio (caos)
-  for _ in range(n_warmup):
-    # Calcular el siguiente valor del mapa logístico
-    x = mapa_logistico(x, r)
-  # Generar la llave aleatoria
-  for _ in range(length * 8):
-    # Calcular el siguiente valor del mapa logístico
-    x = mapa_logistico(x, r)
-    # Convertir el valor del mapa logístico a un bit (0 o 1)
-    bit = int(x > 0.5)
-    # Agregar el bit a la llave
-    key_bits.append(bit)
-  # Convertir los bits a bytes (para XOR con los bytes del mensaje)
-  # packbits: Convierte una matriz de bits en una matriz de bytes (8 bits) (uint8)
-  key = np.packbits(key_bits)[:length]
-  return key
\ No newline at end of file
+  if bits_por_iteracion not in (1, 2, 4, 8):
+    raise ValueError("bits_por_iteracion debe ser 1, 2, 4 u 8")
+  if _llave_compilada is not None:
+    return _llave_compilada(float(x0), float(r), int(n_warmup), int(length), int(bits_por_iteracion))
+  # Calentar el sistema (descartar los primeros valores) y generar una iteración por cada grupo de bits de la llave
+  orbita = prefijo_orbita(x0, r, n_warmup, length * 8 // bits_por_iteracion)
+  return cuantizar_orbita(orbita, length, bits_por_iteracion)
+
+def generar_llaves_lote(x0s, rs, n_warmups, lengths, bits_por_iteracion=1, relleno=True):
+  """Generar un lote de llaves, una por mensaje con su propio par (x0, r), avanzando todos los
+  flujos a la vez: en cada paso el mapa logístico se aplica a un vector con el estado de cada flujo.
+  El número de pasos en Python es el de la llave más larga, sin importar cuántas llaves se generen.
+  Cada llave es idéntica a la que produce generar_llave con los mismos parámetros.
+
+  Args:
+      x0s (array): Valores iniciales de cada flujo (rango: [0, 1])
+      rs (array | float): Parámetros de caos de cada flujo (rango: [3.57, 4])
+      n_warmups (array | int): Iteraciones de calentamiento de cada flujo
+      lengths (array | int): Longitud en bytes de cada llave
+      bits_por_iteracion (int, optional): Bits de llave extraídos de cada iteración (1, 2, 4 u 8). Defaults to 1.
+      relleno (bool, optional): Si es True retorna una matriz rellenada con ceros; si es False una lista de llaves. Defaults to True.
+
+  Returns:
+      numpy.array | list: Matriz (n_llaves, longitud máxima) de bytes (uint8) o lista de arreglos de bytes
+  """
+  if bits_por_iteracion not in (1, 2, 4, 8):
+    raise ValueError("bits_por_iteracion debe ser 1, 2, 4 u 8")
+  x0s, rs, n_warmups, lengths = np.broadcast_arrays(
+    np.asarray(x0s, dtype=np.float64),
+    np.asarray(rs, dtype=np.float64),
+    np.asarray(n_warmups, dtype=np.int64),
+    np.asarray(lengths, dtype=np.int64))
+  n_iteraciones = lengths * 8 // bits_por_iteracion
+  filas = np.arange(len(x0s))
+  # Los pasos se cuantizan por bloques directamente en la matriz de llaves (sin guardar toda la órbita):
+  # solo se guardan los valores de un bloque de pasos, a lo sumo LIMITE_BLOQUE_LOTE bytes. Los bytes de relleno quedan en 0
+  llaves = np.zeros((len(x0s), lengths.max(initial=0)), dtype=np.uint8)
+  por_byte = 8 // bits_por_iteracion
+  n_pasos = int((n_warmups + n_iteraciones).max(initial=0))
+  tamano_bloque = max(1, min(n_pasos, LIMITE_BLOQUE_LOTE // (8 * max(1, len(x0s)))))
+  bloque = np.empty((len(x0s), tamano_bloque), dtype=np.float64)
+  x = x0s.copy()
+  for inicio in range(0, n_pasos, tamano_bloque):
+    n_bloque = min(tamano_bloque, n_pasos - inicio)
+    for paso in range(n_bloque):
+      # Misma expresión que mapa_logistico, aplicada a todos los flujos
+      x = rs * x * (1 - x)
+      bloque[:, paso] = x
+    # Iteración de la llave que corresponde a cada paso del bloque en cada flujo (negativa durante el calentamiento)
+    columnas = inicio + np.arange(n_bloque) - n_warmups[:, None]
+    fila, paso = np.nonzero((columnas >= 0) & (columnas < n_iteraciones[:, None]))
+    if len(fila) == 0:
+      continue
+    columna = columnas[fila, paso]
+    # Misma regla que cuantizar_orbita; el primer valor de cada byte ocupa los bits más significativos
+    valores = cuantizar_valores(bloque[fila, paso], bits_por_iteracion)
+    desplazamiento = (bits_por_iteracion * (por_byte - 1 - columna % por_byte)).astype(np.uint8)
+    np.bitwise_or.at(llaves, (fila, columna // por_byte), valores << desplazamiento)
+  if relleno:
+    return llaves
+  return [llaves[i, :lengths[i]] for i in filas]
@@ -0,0 +1,198 @@
+import numpy as np
+import zlib
+from src.utils.utils import CargaBits, bits_to_array
+
+# Modos de código corrector de errores disponibles
+MODOS_ECC = ('repeticion', 'hamming', 'convolucional')
+
+# Número de repeticiones de cada bit (impar, para que la votación por mayoría no empate)
+REPETICIONES_ECC = 3
+
+# Bits de datos por bloque del código convolucional (cada bloque termina en el estado 0 y se decodifica en paralelo con los demás)
+BLOQUE_VITERBI = 1024
+
+# Bits del prefijo con la longitud del mensaje (los códigos rellenan la carga y el prefijo permite descartar el relleno)
+BITS_LONGITUD_ECC = 32
+
+# Bits del CRC32 de los bits del mensaje, que verifica la integridad después de decodificar
+BITS_CRC_ECC = 32
+
+# Hamming (7,4): matriz generadora [I | P] y de paridad [P^T | I]
+_P_HAMMING = np.array([[1, 1, 0], [1, 0, 1], [0, 1, 1], [1, 1, 1]], dtype=np.uint8)
+_G_HAMMING = np.hstack([np.eye(4, dtype=np.uint8), _P_HAMMING])
+_H_HAMMING = np.hstack([_P_HAMMING.T, np.eye(3, dtype=np.uint8)])
+# Posición del bit erróneo para cada síndrome (el síndrome de un error en la columna j es la columna j de H)
+_POSICION_SINDROME = np.full(8, -1, dtype=np.intp)
+_POSICION_SINDROME[_H_HAMMING[0] * 4 + _H_HAMMING[1] * 2 + _H_HAMMING[2]] = np.arange(7)
+
+# Código convolucional K=3, tasa 1/2, generadores (7, 5) en octal. Estado = (bit anterior, bit de hace dos pasos)
+_ESTADOS = np.arange(4)
+# Predecesores de cada estado: el estado s = (u, b1) viene de (b1, b2) con b2 = 0 o 1
+_PREDECESORES = np.stack([(_ESTADOS & 1) << 1, ((_ESTADOS & 1) << 1) | 1], axis=1)
+_ENTRADA_ESTADO = _ESTADOS >> 1
+# Salidas esperadas en la transición predecesor -> estado: (u ^ b1 ^ b2, u ^ b2)
+_SALIDA_1 = (_ENTRADA_ESTADO[:, None] ^ (_PREDECESORES >> 1) ^ (_PREDECESORES & 1)).astype(np.uint8)
+_SALIDA_2 = (_ENTRADA_ESTADO[:, None] ^ (_PREDECESORES & 1)).astype(np.uint8)
+
+def tasa_codigo(modo):
+  """Obtener la tasa (bits de datos por bit codificado) de un modo de código corrector de errores
+
+  Args:
+      modo (str): Modo de código ('repeticion', 'hamming' o 'convolucional')
+
+  Returns:
+      float: Tasa del código (sin contar el prefijo de longitud y CRC32 ni el relleno)
+
+  Raises:
+      ValueError: Si el modo no es soportado
+  """
+  if modo == 'repeticion':
+    return 1 / REPETICIONES_ECC
+  if modo == 'hamming':
+    return 4 / 7
+  if modo == 'convolucional':
+    return BLOQUE_VITERBI / (2 * (BLOQUE_VITERBI + 2))
+  raise ValueError(f"Modo de código corrector de errores no soportado: {modo}")
+
+def _crc_bits(bits):
+  """CRC32 de la longitud y de los bits (empaquetados) del mensaje, como arreglo de BITS_CRC_ECC bits"""
+  crc = zlib.crc32(np.packbits(bits).tobytes(), zlib.crc32(np.array([len(bits)], dtype='>u4').tobytes()))
+  return np.unpackbits(np.array([crc], dtype='>u4').view(np.uint8))
+
+def _con_longitud(bits):
+  """Anteponer a los bits su longitud en BITS_LONGITUD_ECC bits y su CRC32 en BITS_CRC_ECC bits"""
+  prefijo = np.unpackbits(np.array([len(bits)], dtype='>u4').view(np.uint8))
+  return np.concatenate([prefijo, _crc_bits(bits), bits])
+
+def _sin_longitud(bits):
+  """Quitar el prefijo de longitud y CRC32 y el relleno de los bits decodificados, y verificar el CRC32
+
+  Returns:
+      tuple: (bits del mensaje, si el CRC32 coincide)
+  """
+  cabecera = BITS_LONGITUD_ECC + BITS_CRC_ECC
+  if len(bits) < cabecera:
+    return bits[:0], False
+  n_bits = int(np.packbits(bits[:BITS_LONGITUD_ECC]).view('>u4')[0])
+  mensaje = bits[cabecera:cabecera + n_bits]
+  return mensaje, len(mensaje) == n_bits and np.array_equal(bits[BITS_LONGITUD_ECC:cabecera], _crc_bits(mensaje))
+
+def codificar_repeticion(bits):
+  """Repetir cada bit REPETICIONES_ECC veces"""
+  return np.repeat(bits, REPETICIONES_ECC)
+
+def decodificar_repeticion(bits):
+  """Decidir cada bit por mayoría entre sus REPETICIONES_ECC copias"""
+  grupos = bits[:len(bits) // REPETICIONES_ECC * REPETICIONES_ECC].reshape(-1, REPETICIONES_ECC)
+  return (grupos.sum(axis=1) > REPETICIONES_ECC // 2).astype(np.uint8)
+
+def codificar_hamming(bits):
+  """Codificar con Hamming (7,4) todos los bloques de 4 bits con un solo producto matricial"""
+  datos = np.zeros(-(-len(bits) // 4) * 4, dtype=np.uint8)
+  datos[:len(bits)] = bits
+  return ((datos.reshape(-1, 4) @ _G_HAMMING) & 1).astype(np.uint8).ravel()
+
+def decodificar_hamming(bits):
+  """Decodificar Hamming (7,4) corrigiendo un bit por bloque: síndrome de todos los bloques y corrección con una sola máscara"""
+  bloques = bits[:len(bits) // 7 * 7].reshape(-1, 7).copy()
+  sindromes = (bloques @ _H_HAMMING.T) & 1
+  posiciones = _POSICION_SINDROME[sindromes[:, 0] * 4 + sindromes[:, 1] * 2 + sindromes[:, 2]]
+  con_error = np.flatnonzero(posiciones >= 0)
+  bloques[con_error, posiciones[con_error]] ^= 1
+  return bloques[:, :4].ravel()
+
+def codificar_convolucional(bits):
+  """Codificar con el código convolucional (7, 5) por bloques de BLOQUE_VITERBI bits, cada uno terminado con dos ceros"""
+  n_bloques = max(1, -(-len(bits) // BLOQUE_VITERBI))
+  bloques = np.zeros((n_bloques, BLOQUE_VITERBI + 4), dtype=np.uint8)
+  datos = np.zeros(n_bloques * BLOQUE_VITERBI, dtype=np.uint8)
+  datos[:len(bits)] = bits
+  # Dos ceros iniciales (estado 0) y dos de cola para volver al estado 0
+  bloques[:, 2:BLOQUE_VITERBI + 2] = datos.reshape(n_bloques, BLOQUE_VITERBI)
+  u, b1, b2 = bloques[:, 2:], bloques[:, 1:-1], bloques[:, :-2]
+  salida = np.empty((n_bloques, BLOQUE_VITERBI + 2, 2), dtype=np.uint8)
+  salida[:, :, 0] = u ^ b1 ^ b2
+  salida[:, :, 1] = u ^ b2
+  return salida.ravel()
+
+def decodificar_convolucional(bits):
+  """Decodificar el código convolucional (7, 5) con el algoritmo de Viterbi (decisión dura),
+    avanzando todos los bloques a la vez: cada paso es una operación sobre la matriz (bloques, estados)"""
+  pasos = BLOQUE_VITERBI + 2
+  n_bloques = len(bits) // (2 * pasos)
+  recibido = bits[:n_bloques * 2 * pasos].reshape(n_bloques, pasos, 2)
+  metricas = np.full((n_bloques, 4), 1 << 30, dtype=np.int64)
+  metricas[:, 0] = 0
+  decisiones = np.empty((pasos, n_bloques, 4), dtype=np.uint8)
+  for t in range(pasos):
+    # Distancia de Hamming entre lo recibido y la salida esperada en cada transición (bloques, estado, predecesor)
+    distancia = ((recibido[:, t, 0, None, None] != _SALIDA_1).astype(np.int64)
+                 + (recibido[:, t, 1, None, None] != _SALIDA_2))
+    candidatas = metricas[:, _PREDECESORES] + distancia
+    decisiones[t] = np.argmin(candidatas, axis=2)
+    metricas = np.min(candidatas, axis=2)
+  # Recorrido hacia atrás desde el estado 0 (los bloques terminan con dos ceros)
+  estados = np.zeros(n_bloques, dtype=np.intp)
+  decodificados = np.empty((n_bloques, pasos), dtype=np.uint8)
+  filas = np.arange(n_bloques)
+  for t in range(pasos - 1, -1, -1):
+    decodificados[:, t] = _ENTRADA_ESTADO[estados]
+    estados = _PREDECESORES[estados, decisiones[t, filas, estados]]
+  return decodificados[:, :BLOQUE_VITERBI].ravel()
+
+_CODIFICADORES = {'repeticion': codificar_repeticion, 'hamming': codificar_hamming, 'convolucional': codificar_convolucional}
+_DECODIFICADORES = {'repeticion': decodificar_repeticion, 'hamming': decodificar_hamming, 'convolucional': decodificar_convolucional}
+
+def codificar_ecc(message_bits, modo):
+  """Proteger una carga de bits con un código corrector de errores, precedida de su longitud y de su CRC32 (32 bits cada uno)
+
+  Args:
+      message_bits (CargaBits | str | array): Bits del mensaje (normalmente la salida de xor_encriptado)
+      modo (str): Modo de código ('repeticion', 'hamming' o 'convolucional')
+
+  Returns:
+      CargaBits: Bits codificados
+
+  Raises:
+      ValueError: Si el modo no es soportado
+  """
+  if modo not in _CODIFICADORES:
+    raise ValueError(f"Modo de código corrector de errores no soportado: {modo}")
+  return CargaBits.desde_bits(_CODIFICADORES[modo](_con_longitud(bits_to_array(message_bits))))
+
+def decodificar_ecc(coded_bits, modo):
+  """Decodificar (corrigiendo errores) una carga protegida con codificar_ecc y verificar su CRC32
+
+  Args:
+      coded_bits (CargaBits | str | array): Bits codificados extraídos del audio
+      modo (str): Modo de código ('repeticion', 'hamming' o 'convolucional')
+
+  Returns:
+      tuple: Tupla con los bits del mensaje (CargaBits) y si el CRC32 de los bits decodificados es correcto (bool)
+
+  Raises:
+      ValueError: Si el modo no es soportado
+  """
+  if modo not in _DECODIFICADORES:
+    raise ValueError(f"Modo de código corrector de errores no soportado: {modo}")
+  bits, crc_correcto = _sin_longitud(_DECODIFICADORES[modo](bits_to_array(coded_bits)))
+  return CargaBits.desde_bits(bits), crc_correcto
+
+def reporte_ecc(n_bits, capacidad_bits, modos=MODOS_ECC):
+  """Reportar para cada modo la tasa del código, los bits codificados y la ocupación de la capacidad del portador
+
+  Args:
+      n_bits (int): Longitud del mensaje en bits
+      capacidad_bits (int): Capacidad del portador en bits (muestras del segmento × bits por muestra)
+      modos (tuple, optional): Modos a evaluar. Defaults to MODOS_ECC.
+
+  Returns:
+      dict: Para cada modo, un diccionario con la tasa, los bits codificados, la ocupación y si cabe en el portador
+  """
+  reporte = {}
+  for modo in modos:
+    n_codificados = len(_CODIFICADORES[modo](np.zeros(n_bits + BITS_LONGITUD_ECC + BITS_CRC_ECC, dtype=np.uint8)))
+    ocupacion = n_codificados / capacidad_bits if capacidad_bits else float('inf')
+    print(f"ECC {modo}: tasa {tasa_codigo(modo):.3f}, {n_codificados} bits codificados, ocupación {ocupacion * 100:.1f}% de la capacidad")
+    reporte[modo] = {"tasa": tasa_codigo(modo), "bits_codificados": n_codificados, "ocupacion": ocupacion, "cabe": n_codificados <= capacidad_bits}
+  return reporte
@@ -315,6 +315,33 @@ def plot_attack_results(results_dict):
     plt.close()
     print("Gráfica de resultados de ataques guardada en: plots/attack_results.png")
 
+# Función para visualizar el mapa de errores por posición de cada ataque
+def plot_attack_error_map(results_dict):
+    """
+    Visualiza un mapa de calor con la tasa de error por posición del mensaje (filas: ataques, columnas: celdas del mensaje)
+    
+    Args:
+        results_dict (dict): Diccionario con los resultados de los ataques (con la clave "mapa_errores" de MotorBER)
+    """
+    attack_names = [name for name, result in results_dict.items() if result.get("mapa_errores") is not None]
+    if not attack_names:
+        print("No hay mapas de errores para graficar")
+        return
+    error_map = np.vstack([results_dict[name]["mapa_errores"] for name in attack_names])
+    
+    plt.figure(figsize=(12, max(4, 0.4 * len(attack_names))))
+    plt.imshow(error_map, aspect='auto', cmap='hot', vmin=0, vmax=max(0.5, error_map.max()), interpolation='nearest')
+    plt.colorbar(label='Tasa de error de bits')
+    plt.yticks(range(len(attack_names)), attack_names)
+    plt.xlabel('Posición en el mensaje (celda)')
+    plt.title('Mapa de errores por posición')
+    
+    plt.tight_layout()
+    plots_dir = ensure_plots_dir()
+    plt.savefig(os.path.join(plots_dir, "attack_error_map.png"))
+    plt.close()
+    print("Gráfica de mapa de errores guardada en: plots/attack_error_map.png")
+
 # Función para visualizar los espectrogramas de diferentes ataques
 def plot_attack_spectrograms(original_audio, attacked_audios_dict, sample_rate):
     """
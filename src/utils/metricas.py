@@ -1,6 +1,6 @@
 import numpy as np
 from scipy.stats import chisquare, ks_2samp, mannwhitneyu
-from math import log, e
+from math import log, e, erfc, sqrt
 import psutil
 import time
 import os
@@ -72,6 +72,10 @@ def mse_psnr(audio_original, audio_modificado):
         float: Valor de la relación señal-ruido de pico (PSNR) entre los dos audios
     """
     try:
+        # Operar en float64 para que las diferencias y los cuadrados no desborden el tipo entero del audio
+        audio_original = np.asarray(audio_original, dtype=np.float64)
+        audio_modificado = np.asarray(audio_modificado, dtype=np.float64)
+        
         # Verificar las dimensiones y asegurar que sean compatibles para la operación
         if len(audio_original.shape) != len(audio_modificado.shape):
             # Si tienen distinto número de dimensiones, convertir para hacerlos compatibles
@@ -317,3 +321,135 @@ def analisis_componentes(audio_original, audio_modificado):
     print(f"Media audio modificado: {media_modificado:.2f}")
     print(f"Desviación estándar audio original: {std_original:.2f}")
     print(f"Desviación estándar audio modificado: {std_modificado:.2f}")
+
+
+# función para evaluar la calidad estadística de una llave (keystream) generada con caos
+def calidad_llave(llave):
+    """Evaluar la calidad estadística de una llave de bytes con pruebas básicas de aleatoriedad
+    (frecuencia y rachas de NIST SP 800-22, chi-cuadrado de bytes y correlación serial).
+
+    Sirve para confirmar que los bits extra de los modos de varios bits por iteración
+    de generar_llave son utilizables: un p-valor menor a 0.01 indica que la llave no es aleatoria.
+
+    Args:
+        llave (numpy.array): Arreglo de bytes (uint8) con la llave
+
+    Returns:
+        dict: Diccionario con los p-valores de cada prueba y la correlación serial entre bits consecutivos
+    """
+    llave = np.asarray(llave, dtype=np.uint8)
+    bits = np.unpackbits(llave).astype(np.int64)
+    n = len(bits)
+    
+    # Prueba de frecuencia (monobit)
+    #  Compara la cantidad de unos y ceros de toda la secuencia.
+    #? formula p = erfc(|sum(2b - 1)| / sqrt(2n))
+    suma = np.sum(2 * bits - 1)
+    p_frecuencia = erfc(abs(suma) / sqrt(2 * n))
+    
+    # Prueba de rachas
+    #  Compara el número de rachas (bloques de bits iguales) con el esperado para una secuencia aleatoria.
+    #? formula p = erfc(|V - 2n*pi*(1-pi)| / (2*sqrt(2n)*pi*(1-pi)))
+    pi = np.mean(bits)
+    rachas = 1 + np.count_nonzero(bits[1:] != bits[:-1])
+    if abs(pi - 0.5) >= 2 / sqrt(n):
+        # La prueba de rachas no aplica si falla la prueba de frecuencia
+        p_rachas = 0.0
+    else:
+        p_rachas = erfc(abs(rachas - 2 * n * pi * (1 - pi)) / (2 * sqrt(2 * n) * pi * (1 - pi)))
+    
+    # Prueba chi-cuadrado sobre la distribución de los 256 valores de byte
+    frecuencias = np.bincount(llave, minlength=256)
+    chi2_stat, p_chi2 = chisquare(frecuencias)
+    
+    # Correlación serial entre bits consecutivos (cercana a 0 en una secuencia aleatoria)
+    correlacion_serial = np.corrcoef(bits[:-1], bits[1:])[0, 1]
+    
+    print(f"Frecuencia (monobit): p-valor={p_frecuencia:.4f}")
+    print(f"Rachas: p-valor={p_rachas:.4f}")
+    print(f"Chi-cuadrado bytes: estadístico={chi2_stat:.2f}, p-valor={p_chi2:.4f}")
+    print(f"Correlación serial: {correlacion_serial:.4f}")
+    
+    return {
+        "p_frecuencia": p_frecuencia,
+        "p_rachas": p_rachas,
+        "p_chi2": p_chi2,
+        "correlacion_serial": correlacion_serial
+    }
+
+# Número de unos de cada valor de byte (respaldo de np.bitwise_count, disponible desde NumPy 2.0)
+_UNOS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+def contar_unos(datos):
+    """Contar los bits en 1 de un arreglo de bytes empaquetados (popcount)
+
+    Args:
+        datos (numpy.array): Arreglo de bytes (uint8)
+
+    Returns:
+        int: Número de bits en 1
+    """
+    datos = np.asarray(datos, dtype=np.uint8)
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(datos).sum(dtype=np.int64))
+    return int(_UNOS_POR_BYTE[datos].sum(dtype=np.int64))
+
+# Clase para medir la tasa de error de bits (BER) de muchas extracciones contra una misma referencia
+class MotorBER:
+    """Motor de tasa de error de bits: guarda una sola vez la carga de referencia (empaquetada) y compara cada
+    carga recibida con un XOR de los bytes y un popcount, sin desempaquetar los bits salvo cuando hay errores.
+
+    Además de la BER reporta las ráfagas de errores (bits erróneos consecutivos) y un mapa de errores por posición:
+    la tasa de error en cada una de n_celdas celdas de igual tamaño a lo largo del mensaje.
+
+    Example:
+        motor = MotorBER(bits_originales)
+        reporte = motor.evaluar(bits_extraidos)
+    """
+    def __init__(self, referencia, n_celdas=64):
+        """Inicializar el motor con la carga de referencia
+
+        Args:
+            referencia (CargaBits): Carga de bits original
+            n_celdas (int, optional): Celdas del mapa de errores por posición. Defaults to 64.
+        """
+        self.referencia = referencia
+        self.n_bits = len(referencia)
+        self.n_celdas = max(1, min(n_celdas, self.n_bits))
+        # Bits de cada celda (la celda de la posición i es i * n_celdas // n_bits)
+        bordes = -(-np.arange(self.n_celdas + 1) * self.n_bits // self.n_celdas)
+        self._bits_por_celda = np.maximum(np.diff(bordes), 1)
+
+    def evaluar(self, recibido):
+        """Comparar una carga recibida con la referencia
+
+        Args:
+            recibido (CargaBits): Carga de bits extraída (misma longitud que la referencia)
+
+        Returns:
+            dict: Errores, BER, estadísticas de ráfagas (número, longitud media y máxima) y mapa de errores por posición
+
+        Raises:
+            ValueError: Si la carga recibida no tiene la longitud de la referencia
+        """
+        if len(recibido) != self.n_bits:
+            raise ValueError(f"La carga recibida tiene {len(recibido)} bits y la referencia {self.n_bits}")
+        diferencia = np.bitwise_xor(self.referencia.datos, recibido.datos)
+        errores = contar_unos(diferencia)
+        rafagas = np.zeros(0, dtype=np.int64)
+        mapa_errores = np.zeros(self.n_celdas)
+        if errores:
+            # Posiciones erróneas: una ráfaga empieza donde la posición anterior no es errónea
+            posiciones = np.flatnonzero(np.unpackbits(diferencia, count=self.n_bits))
+            inicios = np.flatnonzero(np.diff(posiciones, prepend=-2) > 1)
+            rafagas = np.diff(np.append(inicios, len(posiciones)))
+            celdas = posiciones * self.n_celdas // self.n_bits
+            mapa_errores = np.bincount(celdas, minlength=self.n_celdas) / self._bits_por_celda
+        return {
+            "errores": errores,
+            "ber": errores / self.n_bits if self.n_bits else 0.0,
+            "rafagas": len(rafagas),
+            "rafaga_media": float(rafagas.mean()) if len(rafagas) else 0.0,
+            "rafaga_maxima": int(rafagas.max()) if len(rafagas) else 0,
+            "mapa_errores": mapa_errores
+        }
@@ -1,7 +1,31 @@
+import operator
 import numpy as np
 
+def extraer_planos_bits(arreglo, num_bits=1):
+  """Obtener los num_bits bits menos significativos de cada muestra como planos de bits, con desplazamientos y máscaras.
+    Las muestras con signo se leen en complemento a dos (sin np.abs), por lo que los bits coinciden
+    con los que escriben las funciones de inserción. Acepta vistas con saltos (strides), por ejemplo
+    un canal de audio estéreo audio[:, 0], sin copiarlas.
+
+  Args:
+      arreglo (numpy.array): Arreglo de muestras enteras (o reales, se leen sus bits crudos)
+      num_bits (int, optional): Número de bits menos significativos a obtener. Defaults to 1.
+
+  Returns:
+      numpy.array: Arreglo uint8 de forma arreglo.shape + (num_bits,); la columna j es el bit num_bits - 1 - j
+        (el más significativo de los num_bits primero, en el mismo orden en que se leería la cadena binaria)
+  """
+  arreglo = np.asarray(arreglo)
+  # Reinterpretar las muestras como enteros sin signo del mismo tamaño (vista, sin copia)
+  sin_signo = arreglo.view(np.dtype(f'u{arreglo.dtype.itemsize}'))
+  planos = np.empty(arreglo.shape + (num_bits,), dtype=np.uint8)
+  for j in range(num_bits):
+    planos[..., j] = (sin_signo >> (num_bits - 1 - j)) & 1
+  return planos
+
 def get_least_significant_bits(segment_array, num_bits=1):
   """Obtener los bits menos significativos de un arreglo de segmentos de audio, retornar una lista de cadenas de bits.
+    Se mantiene por compatibilidad (lee los bits de la magnitud de cada muestra); para procesar audio usar extraer_planos_bits.
 
   Args:
       segment_array (array): Arreglo de segmentos de audio
@@ -10,35 +34,16 @@ def get_least_significant_bits(segment_array, num_bits=1):
   Returns:
       list: Lista de cadenas de bits (str) con los bits menos significativos de cada segmento de audio.
   """
-  try:
-    # Verificar si es un array multidimensional
-    if len(segment_array.shape) > 1:
-      # Si el array es bidimensional (estéreo), trabajar solo con el canal izquierdo
-      if segment_array.shape[1] == 2:
-        segment_array = segment_array[:,0]
-      
-    # Asegurarse de que todos los elementos sean enteros positivos para format
-    segment_array = np.abs(segment_array).astype(np.int64)
-    
-    # Obtener los bits menos significativos
-    least_significant_bits = []
-    for sample in segment_array:
-      try:
-        binary = format(sample, 'b')
-        if len(binary) >= num_bits:
-          least_significant_bits.append(binary[-num_bits:])
-        else:
-          # Si el número no tiene suficientes bits, rellenar con ceros
-          least_significant_bits.append(binary.zfill(num_bits)[-num_bits:])
-      except Exception as e:
-        print(f"Error al procesar muestra {sample}: {e}")
-        least_significant_bits.append('0' * num_bits)
-        
-    return least_significant_bits
-  except Exception as e:
-    print(f"Error en get_least_significant_bits: {e}")
-    # Devolver un array vacío o de ceros en caso de error
-    return ['0' * num_bits for _ in range(len(segment_array))]
+  # Verificar si es un array multidimensional
+  if len(segment_array.shape) > 1:
+    # Si el array es bidimensional (estéreo), trabajar solo con el canal izquierdo
+    if segment_array.shape[1] == 2:
+      segment_array = segment_array[:,0]
+  
+  # Trabajar con la magnitud de cada muestra
+  planos = extraer_planos_bits(np.abs(segment_array.astype(np.int64)), num_bits)
+  # Convertir cada fila de bits en su cadena ('0'/'1') sin iterar muestra por muestra
+  return (planos + ord('0')).view(f'S{num_bits}').ravel().astype(str).tolist()
 
 def bytes_to_bits(byte_array):
   """Convertir un arreglo de bytes a una cadena de bits
@@ -49,4 +54,122 @@ def bytes_to_bits(byte_array):
   Returns:
       str: Cadena de bits
   """
-  return ''.join([format(byte, '08b') for byte in byte_array])
\ No newline at end of file
+  return ''.join([format(byte, '08b') for byte in byte_array])
+
+def bits_to_array(message_bits):
+  """Convertir una cadena de bits ('0'/'1') a un arreglo de numpy de enteros 0 o 1
+
+  Args:
+      message_bits (str | array | CargaBits): Cadena de bits, arreglo con valores 0 o 1 o carga empaquetada
+
+  Returns:
+      numpy.array: Arreglo de numpy (uint8) con un bit por posición
+  """
+  if isinstance(message_bits, CargaBits):
+    return message_bits.bits()
+  if isinstance(message_bits, str):
+    # Restar el código ASCII de '0' convierte cada carácter en su valor de bit sin iterar en Python
+    return np.frombuffer(message_bits.encode('ascii'), dtype=np.uint8) - ord('0')
+  return np.asarray(message_bits, dtype=np.uint8)
+
+def array_to_bits(bit_array):
+  """Convertir un arreglo de numpy de enteros 0 o 1 a una cadena de bits ('0'/'1')
+
+  Args:
+      bit_array (numpy.array): Arreglo con un bit por posición
+
+  Returns:
+      str: Cadena de bits
+  """
+  return (np.asarray(bit_array, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
+
+class CargaBits:
+  """Carga útil de bits empaquetada: 8 bits por byte en un arreglo uint8 (np.packbits / np.unpackbits).
+
+  Es la representación que recorren el cifrado, la inserción, la extracción y la evaluación de ataques;
+  las cadenas de '0'/'1' solo se usan en los bordes (desde_cadena / str()).
+
+  Attributes:
+    datos (numpy.array): Bytes (uint8) con los bits empaquetados, el primer bit es el más significativo del primer byte
+    n_bits (int): Número de bits válidos (los bits de relleno del último byte son siempre 0)
+  """
+  def __init__(self, datos, n_bits=None):
+    self.datos = np.asarray(datos, dtype=np.uint8).reshape(-1)
+    self.n_bits = len(self.datos) * 8 if n_bits is None else int(n_bits)
+    if not 0 <= self.n_bits <= len(self.datos) * 8:
+      raise ValueError(f"n_bits ({self.n_bits}) debe estar entre 0 y {len(self.datos) * 8} (bits de los datos)")
+    # Conservar solo los bytes que contienen bits válidos
+    self.datos = self.datos[:(self.n_bits + 7) // 8]
+    if self.n_bits % 8:
+      # Limpiar los bits de relleno para que dos cargas iguales tengan los mismos bytes
+      self.datos = self.datos.copy()
+      self.datos[-1] &= (0xFF << (8 - self.n_bits % 8)) & 0xFF
+
+  @classmethod
+  def desde_bits(cls, bits):
+    """Crear una carga a partir de un arreglo de bits (valores 0 o 1)"""
+    bits = np.asarray(bits, dtype=np.uint8)
+    return cls(np.packbits(bits), len(bits))
+
+  @classmethod
+  def desde_cadena(cls, cadena):
+    """Crear una carga a partir de una cadena de bits ('0'/'1')"""
+    return cls.desde_bits(bits_to_array(cadena))
+
+  @classmethod
+  def desde_bytes(cls, datos):
+    """Crear una carga a partir de bytes (bytes, bytearray, memoryview o arreglo uint8)"""
+    if isinstance(datos, np.ndarray):
+      return cls(datos.view(np.uint8))
+    return cls(np.frombuffer(datos, dtype=np.uint8))
+
+  @classmethod
+  def desde(cls, valor):
+    """Convertir cualquier representación soportada a CargaBits: otra CargaBits, una cadena de
+    bits, un objeto de bytes (bytes, bytearray, memoryview) o un arreglo de bits (0 o 1)"""
+    if isinstance(valor, cls):
+      return valor
+    if isinstance(valor, str):
+      return cls.desde_cadena(valor)
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+      return cls.desde_bytes(valor)
+    return cls.desde_bits(valor)
+
+  def bits(self):
+    """Desempaquetar la carga en un arreglo de bits (uint8, valores 0 o 1)"""
+    return np.unpackbits(self.datos, count=self.n_bits)
+
+  def a_bytes(self):
+    """Obtener los bytes de la carga"""
+    return self.datos.tobytes()
+
+  def __len__(self):
+    return self.n_bits
+
+  def __getitem__(self, indice):
+    if isinstance(indice, slice):
+      return CargaBits.desde_bits(self.bits()[indice])
+    # Leer el bit directamente del byte empaquetado (O(1)) sin desempaquetar toda la carga
+    i = operator.index(indice)
+    if i < 0:
+      i += self.n_bits
+    if not 0 <= i < self.n_bits:
+      raise IndexError(f"Índice {indice} fuera de rango para una carga de {self.n_bits} bits")
+    return (int(self.datos[i >> 3]) >> (7 - (i & 7))) & 1
+
+  def __eq__(self, otro):
+    if not isinstance(otro, (CargaBits, str)):
+      return NotImplemented
+    otro = CargaBits.desde(otro)
+    return self.n_bits == otro.n_bits and np.array_equal(self.datos, otro.datos)
+
+  # No es hashable: los datos son un arreglo mutable y una carga es igual a su cadena de bits,
+  # por lo que ningún hash sobre (n_bits, bytes) sería coherente con __eq__.
+  # Para usarla como clave de diccionario, usar (len(carga), carga.a_bytes())
+  __hash__ = None
+
+  def __str__(self):
+    return array_to_bits(self.bits())
+
+  def __repr__(self):
+    return f"CargaBits(n_bits={self.n_bits})"